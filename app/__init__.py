@@ -3,6 +3,7 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from config.config import config
 from app.models.show_metadata import db
+from app.api.archive_api import init_archive_api
 import os
 
 migrate = Migrate()
@@ -18,6 +19,15 @@ def create_app(config_name='default'):
     db.init_app(app)
     migrate.init_app(app, db)
     CORS(app)
+    init_archive_api(app)
+    
+    # Per-request query counts, Server-Timing and N+1 warnings
+    from app.api.query_stats import init_query_stats
+    init_query_stats(app)
+    
+    # Background task queue (backup pipelines)
+    from app.tasks import celery_init_app
+    celery_init_app(app)
     
     # Create storage directories
     os.makedirs(app.config['METADATA_STORAGE_PATH'], exist_ok=True)
@@ -34,4 +44,8 @@ def create_app(config_name='default'):
     from app.main_routes import main_bp
     app.register_blueprint(main_bp)
     
+    # Maintenance commands (flask backfill-show-columns, ...)
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app 
\ No newline at end of file
@@ -1,21 +1,108 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import current_app
 import json
 import urllib.parse
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Callable
+from typing import Optional, Dict, Any, List, Callable, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor, Future
+import copy
 import os
+import socket
+import threading
 import time
 
+from app.api.checksums import FileDigest
+from app.api.response_cache import ResponseCache, response_cache_from_config
+from app.api.single_flight import SingleFlight
+
+# Read size for streamed downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Fields iter_scrape asks for unless told otherwise (what the search URL builders request)
+DEFAULT_SCRAPE_FIELDS = "identifier,date,venue,transferer,source,coverage,stars,avg_rating,num_reviews,collection,creator"
+
+# Seconds responses stay cached, per kind of call; 'not_found' applies to 404s
+DEFAULT_CACHE_TTLS = {'metadata': 300, 'search': 600, 'total': 3600, 'not_found': 60}
+
 class ArchiveAPI:
     """Python implementation of the Archive.org API client, mirroring the Swift ArchiveAPI.swift"""
     
-    def __init__(self, timeout: int = 10000):
-        self.base_url = "https://archive.org/"
-        self.timeout = timeout / 1000  # Convert to seconds
+    def __init__(self, timeout: int = 10000, base_url: str = "https://archive.org/",
+                 connect_timeout: Optional[int] = None, pool_connections: int = 4,
+                 pool_maxsize: int = 16, max_retries: int = 2, download_retries: int = 3,
+                 download_segments: int = 4, segment_threshold: int = 0,
+                 cache: Optional[ResponseCache] = None, cache_ttls: Optional[Dict[str, float]] = None,
+                 single_flight: bool = True, shared_single_flight: bool = False,
+                 single_flight_wait: float = 10, scrape_page_size: int = 1000, search_workers: int = 4):
+        self.base_url = base_url
+        self.search_workers = search_workers  # Threads for search_async; started on first use
+        self._search_executor = None
+        self._search_executor_lock = threading.Lock()
+        self.scrape_page_size = scrape_page_size  # Rows per iter_scrape request (the API allows 100-10000)
+        self.cache = cache
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        # Identical concurrent calls collapse into one upstream request
+        self.single_flight = SingleFlight() if single_flight else None
+        self.shared_single_flight = shared_single_flight  # Also across workers, via the shared cache
+        self.single_flight_wait = single_flight_wait  # Seconds to wait on another worker's fetch
+        # Timeouts are configured in milliseconds; requests wants seconds
+        if connect_timeout:
+            self.timeout = (connect_timeout / 1000, timeout / 1000)
+        else:
+            self.timeout = timeout / 1000
+        self.download_retries = download_retries  # Range resumes after a dropped connection
+        self.download_segments = download_segments  # Parallel byte ranges for large files
+        self.segment_threshold = segment_threshold  # Bytes; 0 disables segmented downloads
+        self.pid = os.getpid()
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'ArchiveBackup/1.0 (Python/Flask Archive.org Backup Client)'
+            'User-Agent': 'ArchiveBackup/1.0 (Python/Flask Archive.org Backup Client)',
+            'Connection': 'keep-alive'
         })
+        
+        # One pool per host (archive.org plus the ia*.us.archive.org data servers);
+        # pool_block caps concurrent connections per host instead of opening extras
+        retry = Retry(total=max_retries, backoff_factor=0.5,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']))
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              pool_block=True, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    @classmethod
+    def from_config(cls, config) -> 'ArchiveAPI':
+        """Build a client from Flask config values"""
+        return cls(
+            timeout=config.get('REQUEST_TIMEOUT', 10000),
+            base_url=config.get('ARCHIVE_BASE_URL', "https://archive.org/"),
+            connect_timeout=config.get('ARCHIVE_CONNECT_TIMEOUT'),
+            pool_connections=config.get('ARCHIVE_POOL_CONNECTIONS', 4),
+            pool_maxsize=config.get('ARCHIVE_POOL_MAXSIZE', 16),
+            max_retries=config.get('ARCHIVE_MAX_RETRIES', 2),
+            download_retries=config.get('DOWNLOAD_RETRIES', 3),
+            download_segments=config.get('DOWNLOAD_SEGMENTS', 4),
+            segment_threshold=config.get('DOWNLOAD_SEGMENT_THRESHOLD', 0),
+            cache=response_cache_from_config(config),
+            cache_ttls={
+                'metadata': config.get('ARCHIVE_CACHE_TTL_METADATA', 300),
+                'search': config.get('ARCHIVE_CACHE_TTL_SEARCH', 600),
+                'total': config.get('ARCHIVE_CACHE_TTL_TOTAL', 3600),
+                'not_found': config.get('ARCHIVE_CACHE_TTL_NOT_FOUND', 60)
+            },
+            single_flight=config.get('ARCHIVE_SINGLE_FLIGHT', True),
+            shared_single_flight=config.get('ARCHIVE_SINGLE_FLIGHT_SHARED', False),
+            single_flight_wait=config.get('ARCHIVE_SINGLE_FLIGHT_WAIT', 10),
+            scrape_page_size=config.get('ARCHIVE_SCRAPE_PAGE_SIZE', 1000),
+            search_workers=config.get('ARCHIVE_SEARCH_WORKERS', 4)
+        )
+    
+    def close(self):
+        """Release pooled connections and search threads"""
+        if self._search_executor is not None:
+            self._search_executor.shutdown(wait=False)
+        self.session.close()
     
     def metadata_url(self, identifier: str) -> str:
         """Build metadata URL for a given identifier"""
@@ -189,72 +276,260 @@ class ArchiveAPI:
         
         print(f"[ArchiveAPI] Search URL: {url}")
         return url
+
+    def item_stats_url(self, identifiers: List[str]) -> str:
+        """Build a scrape URL returning rating and download stats for a batch of identifiers"""
+        fields = "identifier,avg_rating,num_reviews,stars,downloads,week,month"
+        query_string = urllib.parse.quote(f"identifier:({' OR '.join(identifiers)})")
+
+        # The scrape API pages at no fewer than 100 rows
+        count = max(100, len(identifiers))
+        return f"{self.base_url}services/search/v1/scrape?fields={fields}&count={count}&q={query_string}"
+
+    def collection_query(self, collection: str = "GratefulDead", sbd_only: bool = False) -> str:
+        """Raw scrape query listing a whole collection (or a creator's items), as the URL builders spell it"""
+        if self._is_creator_based(collection):
+            return f'creator:"{collection}"'
+        if sbd_only:
+            return f"collection:({collection} AND stream_only)"
+        return f"collection:({collection})"
+    
+    def scrape_url(self, query: str, fields: str = DEFAULT_SCRAPE_FIELDS, count: int = 100,
+                   cursor: Optional[str] = None) -> str:
+        """Build a scrape API URL for a raw (unencoded) query, optionally continuing from a cursor"""
+        url = f"{self.base_url}services/search/v1/scrape?fields={fields}&count={count}"
+        url += f"&q={urllib.parse.quote(query, safe='')}"
+        if cursor:
+            url += f"&cursor={urllib.parse.quote(cursor, safe='')}"
+        return url
     
-    def get_metadata(self, identifier: str) -> Optional[Dict[str, Any]]:
-        """Get metadata for a show identifier"""
+    def iter_scrape(self, query: str, fields: Union[str, List[str]] = DEFAULT_SCRAPE_FIELDS,
+                    page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every item matching a scrape query, following the API's cursors page by page.
+
+        Pages are requested lazily as the caller consumes items, so memory stays
+        at one page however large the result set, and a caller that stops early
+        never fetches the rest. Pages bypass the response cache (cursors are
+        single-use). Raises LookupError if a page cannot be fetched.
+        """
+        if not isinstance(fields, str):
+            fields = ','.join(fields)
+        count = max(100, min(page_size or self.scrape_page_size, 10000))
+        
+        cursor = None
+        pages = 0
+        while True:
+            status_code, page = self._request_json(self.scrape_url(query, fields, count, cursor), 'iter_scrape')
+            if status_code != 200 or not isinstance(page, dict):
+                raise LookupError(f"Scrape page {pages + 1} failed for query {query!r} ({status_code})")
+            pages += 1
+            
+            cursor = page.get('cursor')
+            items = page.get('items') or []
+            page = None
+            yield from items
+            
+            if not cursor or not items:
+                return
+            items = None
+    
+    def get_metadata(self, identifier: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Get metadata for a show identifier.
+
+        refresh skips the cached copy (backups want the current document) but
+        still stores the new one.
+        """
         url = self.metadata_url(identifier)
+        return self._cached_json('metadata', url, refresh, lambda: self._request_json(url, 'get_metadata'))
+    
+    def get_item_last_updated(self, identifier: str) -> Optional[int]:
+        """An item's item_last_updated stamp, read from the metadata API sub-path (a few bytes, never cached)"""
+        status_code, data = self._request_json(f"{self.metadata_url(identifier)}/item_last_updated",
+                                               'get_item_last_updated')
+        result = data.get('result') if status_code == 200 and isinstance(data, dict) else None
+        try:
+            return int(result) if result is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def get_metadata_if_changed(self, identifier: str, etag: Optional[str] = None,
+                                last_modified: Optional[str] = None) -> tuple:
+        """Conditional metadata GET with If-None-Match / If-Modified-Since.
+
+        Returns (status code, document, validators): 304 means the copy the
+        validators came from is still current. A 200 also refreshes the cache;
+        validators holds the new response's 'etag' and 'last_modified'.
+        """
+        url = self.metadata_url(identifier)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
         start_time = time.time()
         
-        print(f"[ArchiveAPI] Requesting metadata from URL: {url} at {self._timestamp()}")
-        
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
             duration = time.time() - start_time
+            print(f"[ArchiveAPI] get_metadata_if_changed for URL: {url} took {duration:.3f} seconds "
+                  f"({response.status_code}).")
             
-            print(f"[ArchiveAPI] get_metadata for URL: {url} took {duration:.3f} seconds.")
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            if response.status_code == 304:
+                return 304, None, validators
+            data = response.json() if response.status_code == 200 else None
+            self._store_response('metadata', f"metadata:{url}", response.status_code, data)
+            return response.status_code, data, validators
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"[ArchiveAPI] Error {response.status_code} for URL {url}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            duration = time.time() - start_time
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"[ArchiveAPI] Error for URL {url}: {str(e)}")
-            print(f"[ArchiveAPI] get_metadata for URL: {url} took {duration:.3f} seconds.")
-            return None
+            return None, None, {}
     
-    def get_search_results(self, url: str) -> Optional[Dict[str, Any]]:
+    def get_search_results(self, url: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
         """Get search results from Archive.org"""
+        return self._cached_json('search', url, refresh, lambda: self._request_json(url, 'get_search_results'))
+    
+    def search_async(self, url: str) -> Future:
+        """Start get_search_results(url) on this client's search threads and return its Future.
+
+        Callers wait with future.result(timeout) and can give up on a slow
+        response; the request still finishes in the background and lands in the
+        cache for the next caller. With every thread busy, calls queue, so the
+        caller's deadline also covers time spent waiting for a thread.
+        """
+        with self._search_executor_lock:
+            if self._search_executor is None:
+                self._search_executor = ThreadPoolExecutor(max_workers=self.search_workers,
+                                                           thread_name_prefix='archive-search')
+        return self._search_executor.submit(self.get_search_results, url)
+    
+    def get_total_results(self, url: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Get total count results from Archive.org"""
+        return self._cached_json('total', url, refresh, lambda: self._request_json(url, 'get_total_results'))
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the response cache and request coalescing (this worker's view)"""
+        stats = self.cache.stats() if self.cache is not None else {'backend': 'none', 'pid': self.pid}
+        stats['single_flight'] = self.single_flight.stats() if self.single_flight is not None else None
+        return stats
+    
+    def _cached_json(self, kind: str, url: str, refresh: bool,
+                     fetch: Callable[[], tuple]) -> Optional[Dict[str, Any]]:
+        """Serve a JSON GET from the cache, or fetch it and cache 200s and 404s.
+
+        Concurrent misses for the same URL share one upstream request: within
+        this worker through single_flight, and across workers through a fill
+        lock in a shared cache when shared_single_flight is on. A failing cache
+        backend is logged and bypassed; it never fails the call.
+        """
+        key = f"{kind}:{url}"
+        if self.cache is not None and not refresh:
+            try:
+                hit, value = self.cache.get(key)
+                if hit:
+                    return value
+            except Exception as e:
+                self.cache.errors += 1
+                print(f"[ArchiveAPI] Cache read failed for {key}: {str(e)}")
+        
+        if self.single_flight is None:
+            return self._fetch_and_store(kind, key, fetch, refresh)
+        
+        data, shared = self.single_flight.do(key, lambda: self._fetch_and_store(kind, key, fetch, refresh))
+        # Every waiter gets its own copy to modify
+        return copy.deepcopy(data) if shared else data
+    
+    def _fetch_and_store(self, kind: str, key: str, fetch: Callable[[], tuple],
+                         refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Fetch once for every worker waiting on key, then cache the result.
+
+        A refresh still takes the fill lock when it is free, so plain misses can
+        wait on it, but never waits on another worker: polling the cache could
+        hand back the very entry the refresh is meant to replace.
+        """
+        lock_token = None
+        if self.shared_single_flight and self.cache is not None and self.cache.shared:
+            try:
+                token = f"{socket.gethostname()}:{self.pid}:{threading.get_ident()}"
+                if self.cache.acquire_fill_lock(key, token, self.single_flight_wait):
+                    lock_token = token
+                elif not refresh:
+                    # Another worker is already fetching this URL; take its result
+                    hit, value = self.cache.wait_for_fill(key, self.single_flight_wait)
+                    if hit:
+                        return value
+            except Exception as e:
+                self.cache.errors += 1
+                print(f"[ArchiveAPI] Fill lock failed for {key}: {str(e)}")
+        
+        try:
+            status_code, data = fetch()
+            self._store_response(kind, key, status_code, data)
+            return data
+        finally:
+            if lock_token is not None:
+                try:
+                    self.cache.release_fill_lock(key, lock_token)
+                except Exception as e:
+                    print(f"[ArchiveAPI] Fill lock release failed for {key}: {str(e)}")
+    
+    def _store_response(self, kind: str, key: str, status_code: Optional[int], data: Any):
+        """Cache a 200 for the kind's TTL and a 404 briefly; anything else is retried next time"""
+        if self.cache is None:
+            return
+        if status_code == 200:
+            ttl = self.cache_ttls[kind]
+        elif status_code == 404:
+            ttl = self.cache_ttls['not_found']
+        else:
+            return
+        try:
+            self.cache.set(key, data, ttl)
+        except Exception as e:
+            self.cache.errors += 1
+            print(f"[ArchiveAPI] Cache write failed for {key}: {str(e)}")
+    
+    def _request_json(self, url: str, label: str) -> tuple:
+        """GET url; returns (status code or None on a connection error, parsed JSON body or None)"""
         start_time = time.time()
         
+        print(f"[ArchiveAPI] Requesting {url} at {self._timestamp()}")
+        
         try:
             response = self.session.get(url, timeout=self.timeout)
             duration = time.time() - start_time
             
-            print(f"[ArchiveAPI] get_search_results for URL: {url} took {duration:.3f} seconds.")
+            print(f"[ArchiveAPI] {label} for URL: {url} took {duration:.3f} seconds.")
             
             if response.status_code == 200:
-                return response.json()
+                return response.status_code, response.json()
             else:
                 print(f"[ArchiveAPI] Error {response.status_code} for URL {url}")
-                return None
+                return response.status_code, None
                 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             duration = time.time() - start_time
             print(f"[ArchiveAPI] Error for URL {url}: {str(e)}")
-            print(f"[ArchiveAPI] get_search_results for URL: {url} took {duration:.3f} seconds.")
-            return None
-    
-    def get_total_results(self, url: str) -> Optional[Dict[str, Any]]:
-        """Get total count results from Archive.org"""
-        try:
-            response = self.session.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"[ArchiveAPI] Error {response.status_code} for URL {url}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            print(f"[ArchiveAPI] Error for URL {url}: {str(e)}")
-            return None
+            print(f"[ArchiveAPI] {label} for URL: {url} took {duration:.3f} seconds.")
+            return None, None
     
     def download_file(self, identifier: str, filename: str, 
-                     progress_callback: Optional[Callable[[float], None]] = None) -> Optional[str]:
-        """Download a file from Archive.org"""
+                     progress_callback: Optional[Callable[[float], None]] = None,
+                     expected_size: Optional[int] = None,
+                     digest: Optional[FileDigest] = None,
+                     segments: Optional[int] = None) -> Optional[str]:
+        """Download a file from Archive.org.
+
+        Bytes land in ``<local_path>.part`` and are moved into place atomically once
+        complete. A dropped connection resumes from the end of the partial file with
+        an HTTP Range request; files of at least ``segment_threshold`` bytes are
+        fetched as parallel byte-range segments, at most ``segments`` of them
+        (``download_segments`` by default, see segment_count()).
+
+        When a FileDigest is given, checksums are computed over the chunks as they
+        are written and the file is rejected (None returned) on any mismatch.
+        """
         download_url = self.download_url(identifier, filename)
         if not download_url:
             print(f"[ArchiveAPI] Could not build download URL for {identifier}/{filename}")
@@ -274,27 +549,40 @@ class ArchiveAPI:
                 return None
 
             local_path = os.path.join(storage_dir, normalized_rel_path)
+            part_path = local_path + '.part'
 
             # Ensure any intermediate directories exist for nested paths
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
             
             print(f"[ArchiveAPI] Starting download from {download_url} to {local_path}")
             
-            with self.session.get(download_url, stream=True, timeout=self.timeout) as response:
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded = 0
-                
-                with open(local_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            
-                            if progress_callback and total_size > 0:
-                                progress = downloaded / total_size
-                                progress_callback(progress)
+            if segments is None:
+                segments = self.segment_count(expected_size)
+            use_segments = segments > 1
+            
+            if digest is None:
+                digest = FileDigest()
+            
+            completed = False
+            if use_segments:
+                completed = self._download_segmented(download_url, part_path, expected_size, digest,
+                                                     segments, progress_callback)
+            if not completed:
+                self._download_resumable(download_url, part_path, digest, progress_callback)
+            
+            if expected_size and os.path.getsize(part_path) != expected_size:
+                print(f"[ArchiveAPI] Size mismatch for {download_url}: expected {expected_size}, "
+                      f"got {os.path.getsize(part_path)}")
+                os.remove(part_path)
+                return None
+            
+            mismatches = digest.mismatches()
+            if mismatches:
+                print(f"[ArchiveAPI] Checksum mismatch ({', '.join(mismatches)}) for {download_url}, discarding download")
+                os.remove(part_path)
+                return None
+            
+            os.replace(part_path, local_path)
             
             print(f"[ArchiveAPI] Download completed. File saved to: {local_path}")
             return local_path
@@ -307,6 +595,173 @@ class ArchiveAPI:
             print(f"[ArchiveAPI] Filesystem error saving {identifier}/{filename}: {e}")
             return None
     
+    def _download_resumable(self, url: str, part_path: str, digest: FileDigest,
+                            progress_callback: Optional[Callable[[float], None]] = None):
+        """Stream url into part_path, resuming with Range after connection failures"""
+        attempt = 0
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            
+            # Keep the running digest in step with the bytes already on disk; this
+            # only reads the file back when resuming a .part left by an earlier run
+            if digest.length != offset:
+                digest.reset()
+                if offset:
+                    digest.update_from_file(part_path)
+            
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                    if response.status_code == 416 and offset:
+                        # Requested past the end: the partial file is already complete
+                        total_size = self._content_range_total(response)
+                        if total_size is None or total_size == offset:
+                            return
+                        offset = 0
+                        os.remove(part_path)
+                        continue
+                    
+                    response.raise_for_status()
+                    
+                    if response.status_code == 206:
+                        mode = 'ab'
+                        total_size = self._content_range_total(response) or 0
+                    else:
+                        # Server ignored the Range header and is sending the whole file
+                        mode = 'wb'
+                        offset = 0
+                        digest.reset()
+                        total_size = int(response.headers.get('content-length', 0))
+                    
+                    downloaded = offset
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                digest.update(chunk)
+                                downloaded += len(chunk)
+                                
+                                if progress_callback and total_size > 0:
+                                    progress_callback(downloaded / total_size)
+                    
+                    if total_size and downloaded < total_size:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"Connection closed after {downloaded} of {total_size} bytes")
+                    return
+            
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout) as e:
+                attempt += 1
+                if attempt > self.download_retries:
+                    raise
+                print(f"[ArchiveAPI] Download interrupted ({str(e)}), resuming {url} "
+                      f"(attempt {attempt}/{self.download_retries})")
+                time.sleep(min(2 ** attempt * 0.5, 10))
+    
+    def segment_count(self, expected_size: Optional[int]) -> int:
+        """Connections download_file() opens at once for a file of this size (1 unless it is segmented)"""
+        if self.download_segments > 1 and self.segment_threshold > 0 and expected_size \
+                and expected_size >= self.segment_threshold:
+            return self.download_segments
+        return 1
+    
+    def _download_segmented(self, url: str, part_path: str, total_size: int, digest: FileDigest,
+                            segments: int, progress_callback: Optional[Callable[[float], None]] = None) -> bool:
+        """Fetch url as parallel byte ranges and join them into part_path.
+
+        Returns False (leaving nothing behind) when the server does not honour
+        Range requests, so the caller can fall back to a single stream.
+        """
+        # Probe range support with a one-byte request before fanning out
+        with self.session.get(url, stream=True, timeout=self.timeout, headers={'Range': 'bytes=0-0'}) as probe:
+            if probe.status_code != 206 or self._content_range_total(probe) != total_size:
+                return False
+        
+        segment_size = -(-total_size // segments)
+        ranges = [(start, min(start + segment_size, total_size) - 1)
+                  for start in range(0, total_size, segment_size)]
+        segment_paths = [f"{part_path}.seg{i}" for i in range(len(ranges))]
+        
+        received = [0] * len(ranges)
+        lock = threading.Lock()
+        
+        def on_segment_progress(index: int, count: int):
+            with lock:
+                received[index] = count
+                if progress_callback:
+                    progress_callback(sum(received) / total_size)
+        
+        print(f"[ArchiveAPI] Downloading {url} in {len(ranges)} segments")
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='segment') as executor:
+            futures = [
+                executor.submit(self._download_range, url, segment_paths[i], start, end,
+                                lambda count, i=i: on_segment_progress(i, count))
+                for i, (start, end) in enumerate(ranges)
+            ]
+            for future in futures:
+                future.result()
+        
+        # Join segments into the .part file in order, hashing on the way through
+        digest.reset()
+        with open(part_path, 'wb') as out:
+            for segment_path in segment_paths:
+                with open(segment_path, 'rb') as segment:
+                    while True:
+                        chunk = segment.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        digest.update(chunk)
+        for segment_path in segment_paths:
+            os.remove(segment_path)
+        
+        return True
+    
+    def _download_range(self, url: str, segment_path: str, start: int, end: int,
+                        progress_callback: Optional[Callable[[int], None]] = None):
+        """Download bytes start..end (inclusive) into segment_path, resuming on failure"""
+        expected = end - start + 1
+        attempt = 0
+        while True:
+            have = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+            if have >= expected:
+                return
+            
+            try:
+                headers = {'Range': f'bytes={start + have}-{end}'}
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise requests.exceptions.ContentDecodingError(f"Range not honoured for {url}")
+                    
+                    with open(segment_path, 'ab') as f:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                have += len(chunk)
+                                if progress_callback:
+                                    progress_callback(have)
+                
+                if have < expected:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Segment closed after {have} of {expected} bytes")
+                return
+            
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout) as e:
+                attempt += 1
+                if attempt > self.download_retries:
+                    raise
+                print(f"[ArchiveAPI] Segment {start}-{end} interrupted ({str(e)}), resuming")
+                time.sleep(min(2 ** attempt * 0.5, 10))
+    
+    @staticmethod
+    def _content_range_total(response) -> Optional[int]:
+        """Total length from a 'Content-Range: bytes a-b/total' header"""
+        content_range = response.headers.get('content-range', '')
+        total = content_range.rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    
     def _is_creator_based(self, collection: str) -> bool:
         """Check if collection uses creator-based search"""
         creator_based_collections = ["etree", "PhilLeshAndFriends", "BobWeir"]
@@ -314,4 +769,22 @@ class ArchiveAPI:
     
     def _timestamp(self) -> str:
         """Get current timestamp in HH:mm:ss.SSS format"""
-        return datetime.now().strftime("%H:%M:%S.%f")[:-3] 
\ No newline at end of file
+        return datetime.now().strftime("%H:%M:%S.%f")[:-3]
+
+
+def init_archive_api(app):
+    """Create the shared Archive.org client for this app"""
+    app.extensions['archive_api'] = ArchiveAPI.from_config(app.config)
+
+
+def get_archive_api() -> ArchiveAPI:
+    """Return the process-wide Archive.org client, keeping its connection pool warm"""
+    archive_api = current_app.extensions.get('archive_api')
+    
+    # gunicorn preloads the app in the master process; sockets must not be shared
+    # across forked workers, so each worker builds its own client on first use
+    if archive_api is None or archive_api.pid != os.getpid():
+        archive_api = ArchiveAPI.from_config(current_app.config)
+        current_app.extensions['archive_api'] = archive_api
+    
+    return archive_api
@@ -1,19 +1,53 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import insert, update, func, case
 from sqlalchemy.exc import IntegrityError
 from app.models.show_metadata import db, ArchiveItem, ArchiveFile, ArchiveItemStats, ArchiveItemReview, BackupJob
-from app.api.archive_api import ArchiveAPI
+from app.api.archive_api import get_archive_api
+from app.api.download_manager import get_download_manager
+from app.api.fulltext import index_item
+from app.api.facets import clear_facet_cache
+from app.api.rollup import item_contribution, apply_rollup_delta, rollup_keys, add_to_rollup, file_size
+from app.api.pagination import newest_first, order_by_keys, keyset_paginate, cursor_pagination_dict
+from collections import Counter
 from datetime import datetime
 import json
 import os
+import time
 
 backup_bp = Blueprint('backup', __name__)
 
+# Rows per executemany when writing file records in bulk
+FILE_WRITE_BATCH = 500
+
+# Top-level metadata API fields stored on ArchiveItem as-is
+ITEM_RESPONSE_FIELDS = ('created', 'd1', 'd2', 'dir', 'files_count', 'item_last_updated', 'item_size', 'server', 'uniq')
+
+# ArchiveItemReview columns copied verbatim from metadata.reviews
+REVIEW_FIELDS = ('reviewbody', 'reviewtitle', 'reviewer', 'reviewdate', 'createdate', 'stars', 'reviewer_itemname')
+
+# ArchiveItemStats columns and the scrape API fields they come from
+STATS_SEARCH_FIELDS = {
+    'avg_rating': 'avg_rating',
+    'num_reviews': 'num_reviews',
+    'stars_json': 'stars',
+    'downloads': 'downloads',
+    'downloads_week': 'week',
+    'downloads_month': 'month'
+}
+
+# ArchiveFile columns copied verbatim from the Archive.org files list
+ARCHIVE_FILE_FIELDS = (
+    'name', 'source', 'format', 'mtime', 'size', 'md5', 'crc32', 'sha1',
+    'length', 'height', 'width', 'track', 'album', 'artist', 'title', 'bitrate', 'creator',
+    'rotation', 'summation'
+)
+
 def create_or_update_stats(archive_item, search_results):
-    """Create or update stats record from search API data"""
+    """Create or update stats record from search API data (an unchanged record is not written)"""
     if not search_results or not search_results.get('items'):
         return None
     
-    search_data = search_results['items'][0]
+    values = stats_values(search_results['items'][0])
     
     # Get or create stats record
     stats = ArchiveItemStats.query.filter_by(archive_item_id=archive_item.id).first()
@@ -21,23 +55,32 @@ def create_or_update_stats(archive_item, search_results):
         stats = ArchiveItemStats(archive_item_id=archive_item.id)
         db.session.add(stats)
     
-    # Update with search API data
-    stats.avg_rating = search_data.get('avg_rating')
-    stats.num_reviews = search_data.get('num_reviews')
-    stats.stars_list = search_data.get('stars', [])
-    stats.downloads = search_data.get('downloads')
-    stats.downloads_week = search_data.get('week')
-    stats.downloads_month = search_data.get('month')
-    stats.last_updated = datetime.utcnow()
+    if assign_changed(stats, values):
+        stats.last_updated = datetime.utcnow()
     
     return stats
 
+def stats_values(search_data):
+    """ArchiveItemStats column values from one scrape API row"""
+    values = {column: search_data.get(field) for column, field in STATS_SEARCH_FIELDS.items()}
+    values['stars_json'] = list(values['stars_json']) if values['stars_json'] else None
+    return values
+
 def create_reviews_from_metadata(archive_item, metadata_response):
-    """Create review records from metadata API reviews data"""
+    """Create review records from metadata API reviews data.
+
+    When the stored reviews already match, nothing is written and the stored
+    rows are returned.
+    """
     reviews_data = metadata_response.get('metadata', {}).get('reviews', [])
     if not reviews_data:
         return []
     
+    existing_reviews = ArchiveItemReview.query.filter_by(archive_item_id=archive_item.id) \
+        .order_by(ArchiveItemReview.id).all()
+    if [review_values(review) for review in existing_reviews] == [review_values(data) for data in reviews_data]:
+        return existing_reviews
+    
     # Clear existing reviews to avoid duplicates
     ArchiveItemReview.query.filter_by(archive_item_id=archive_item.id).delete()
     
@@ -45,63 +88,54 @@ def create_reviews_from_metadata(archive_item, metadata_response):
     for review_data in reviews_data:
         review = ArchiveItemReview(
             archive_item_id=archive_item.id,
-            reviewbody=review_data.get('reviewbody'),
-            reviewtitle=review_data.get('reviewtitle'),
-            reviewer=review_data.get('reviewer'),
-            reviewdate=review_data.get('reviewdate'),
-            createdate=review_data.get('createdate'),
-            stars=review_data.get('stars'),
-            reviewer_itemname=review_data.get('reviewer_itemname')
+            **{field: review_data.get(field) for field in REVIEW_FIELDS}
         )
         db.session.add(review)
         created_reviews.append(review)
     
+    # Reviews are part of the item's full-text entry
+    index_item(archive_item, created_reviews)
+    
     return created_reviews
 
+def review_values(review):
+    """Comparable field values of a stored review or a metadata reviews entry"""
+    get = review.get if isinstance(review, dict) else lambda field: getattr(review, field)
+    return tuple(None if get(field) is None else str(get(field)) for field in REVIEW_FIELDS)
+
 @backup_bp.route('/metadata/<identifier>', methods=['POST'])
 def backup_metadata(identifier):
     """Backup metadata for a specific show identifier"""
     try:
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
-        
-        # Get metadata from Archive.org (clean metadata API data)
-        metadata_response = archive_api.get_metadata(identifier)
-        if not metadata_response:
+        # Shared Archive API client (pooled per worker)
+        archive_api = get_archive_api()
+        
+        # Create or update metadata (metadata API data only), committing it first.
+        # Items whose item_last_updated/ETag show no change are not downloaded
+        # again unless ?force=true
+        force = request.args.get('force', 'false').lower() == 'true'
+        archive_item, action, metadata_response = refresh_item_metadata(archive_api, identifier, force=force)
+        if action is None:
             return jsonify({'error': 'Failed to fetch metadata from Archive.org'}), 404
-        
-        # Check if metadata already exists
-        existing_metadata = ArchiveItem.query.filter_by(identifier=identifier).first()
-        
-        if existing_metadata:
-            # Update existing metadata (metadata API data only)
-            update_metadata_from_response(existing_metadata, metadata_response)
-            archive_item = existing_metadata
-        else:
-            # Create new metadata (metadata API data only)
-            archive_item = create_metadata_from_response(metadata_response)
-            db.session.add(archive_item)
-        
-        # Commit metadata first
         db.session.commit()
         
         # Extract and store reviews from metadata (part of metadata API)
-        reviews = create_reviews_from_metadata(archive_item, metadata_response)
+        if metadata_response is not None:
+            reviews = create_reviews_from_metadata(archive_item, metadata_response)
+        else:
+            reviews = archive_item.reviews
         
         # Separately fetch and store stats/rating data from search API
         try:
-            search_url = f"{archive_api.base_url}services/search/v1/scrape?fields=avg_rating,num_reviews,stars,downloads,week,month&q=identifier:{identifier}"
-            search_results = archive_api.get_search_results(search_url)
-            create_or_update_stats(archive_item, search_results)
+            fetch_item_stats(archive_api, archive_item)
         except Exception as e:
             print(f"Warning: Could not fetch stats data: {str(e)}")
             # Continue without stats - not critical for metadata backup
         
         db.session.commit()
         
-        action = 'updated' if existing_metadata else 'created'
         return jsonify({
-            'message': f'Metadata {action} successfully',
+            'message': 'Metadata already up to date' if action == 'unchanged' else f'Metadata {action} successfully',
             'identifier': identifier,
             'action': action,
             'has_stats': archive_item.stats is not None,
@@ -117,77 +151,21 @@ def backup_metadata(identifier):
 
 @backup_bp.route('/files/<identifier>', methods=['POST'])
 def backup_files(identifier):
-    """Backup files for a specific show identifier"""
+    """Queue a file backup for a specific show identifier"""
     try:
         # Get archive item
         archive_item = ArchiveItem.query.filter_by(identifier=identifier).first()
         if not archive_item:
             return jsonify({'error': 'Archive item not found. Please backup metadata first.'}), 404
         
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
-        
-        # Get file list from metadata
-        metadata_response = archive_api.get_metadata(identifier)
-        if not metadata_response or 'files' not in metadata_response:
-            return jsonify({'error': 'Failed to fetch file list from Archive.org'}), 404
-        
-        files = metadata_response['files']
-        downloaded_files = []
-        failed_files = []
-        
-        # Filter for MP3 files only (most efficient and universally allowed)
-        audio_extensions = ['.mp3']
-        audio_files = [f for f in files if any(f.get('name', '').lower().endswith(ext) for ext in audio_extensions)]
-        
-        for file_info in audio_files:
-            filename = file_info.get('name')
-            if not filename:
-                continue
-            
-            # Check if file already downloaded
-            existing_file = ArchiveFile.query.filter_by(
-                archive_item_id=archive_item.id,
-                name=filename
-            ).first()
-            
-            if existing_file and existing_file.is_downloaded:
-                continue
-            
-            # Download file
-            local_path = archive_api.download_file(identifier, filename)
-            
-            if local_path:
-                # Create or update file record
-                if existing_file:
-                    existing_file.local_path = local_path
-                    existing_file.is_downloaded = True
-                    existing_file.download_date = datetime.utcnow()
-                else:
-                    archive_file = create_file_from_info(file_info, archive_item.id)
-                    archive_file.local_path = local_path
-                    archive_file.is_downloaded = True
-                    archive_file.download_date = datetime.utcnow()
-                    db.session.add(archive_file)
-                
-                downloaded_files.append(filename)
-            else:
-                failed_files.append(filename)
-        
-        # Update archive item backup status
-        archive_item.is_backed_up = True
-        archive_item.backup_date = datetime.utcnow()
-        
-        db.session.commit()
+        job = enqueue_backup_job(identifier, 'files')
         
         return jsonify({
-            'message': 'File backup completed',
+            'message': 'File backup queued',
             'identifier': identifier,
-            'downloaded_files': downloaded_files,
-            'failed_files': failed_files,
-            'total_downloaded': len(downloaded_files),
-            'total_failed': len(failed_files)
-        })
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
@@ -195,141 +173,18 @@ def backup_files(identifier):
 
 @backup_bp.route('/full/<identifier>', methods=['POST'])
 def backup_full(identifier):
-    """Backup both metadata and files for a specific show identifier"""
+    """Queue a metadata and file backup for a specific show identifier"""
     try:
-        print(f"[DEBUG] Starting full backup for {identifier}")
-        
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
-        
-        # Get metadata from Archive.org
-        print(f"[DEBUG] Fetching metadata from Archive.org")
-        metadata_response = archive_api.get_metadata(identifier)
-        if not metadata_response:
-            return jsonify({'error': 'Failed to fetch metadata from Archive.org'}), 404
-        
-        print(f"[DEBUG] Metadata fetched successfully")
-        
-        # Check if metadata already exists
-        existing_metadata = ArchiveItem.query.filter_by(identifier=identifier).first()
-        
-        if existing_metadata:
-            print(f"[DEBUG] Updating existing metadata")
-            # Update existing metadata
-            try:
-                update_metadata_from_response(existing_metadata, metadata_response)
-                archive_item = existing_metadata
-            except Exception as e:
-                print(f"[DEBUG] Error updating metadata: {str(e)}")
-                raise e
-        else:
-            print(f"[DEBUG] Creating new metadata")
-            # Create new metadata
-            try:
-                archive_item = create_metadata_from_response(metadata_response)
-                db.session.add(archive_item)
-            except Exception as e:
-                print(f"[DEBUG] Error creating metadata: {str(e)}")
-                raise e
-        
-        print(f"[DEBUG] Committing metadata to database")
-        db.session.commit()
-        print(f"[DEBUG] Metadata committed successfully")
-        
-        # Extract and store reviews from metadata (part of metadata API)
-        print(f"[DEBUG] Extracting reviews from metadata")
-        reviews = create_reviews_from_metadata(archive_item, metadata_response)
-        print(f"[DEBUG] Found {len(reviews)} reviews")
-        
-        # Separately fetch and store stats/rating data from search API
-        print(f"[DEBUG] Fetching stats data from search API")
-        try:
-            search_url = f"{archive_api.base_url}services/search/v1/scrape?fields=avg_rating,num_reviews,stars,downloads,week,month&q=identifier:{identifier}"
-            search_results = archive_api.get_search_results(search_url)
-            stats = create_or_update_stats(archive_item, search_results)
-            if stats:
-                print(f"[DEBUG] Stats updated: {stats.avg_rating} stars, {stats.num_reviews} reviews, {stats.downloads} downloads")
-            db.session.commit()
-        except Exception as e:
-            print(f"[DEBUG] Could not fetch stats data: {str(e)}")
-            # Continue without stats - not critical
-
-        # Now backup files
-        files = metadata_response.get('files', [])
-        downloaded_files = []
-        failed_files = []
-        
-        # Filter for MP3 files only (most efficient and universally allowed)
-        audio_extensions = ['.mp3']
-        audio_files = [f for f in files if any(f.get('name', '').lower().endswith(ext) for ext in audio_extensions)]
-        
-        total_files = len(audio_files)
-        print(f"[DEBUG] Found {total_files} audio files to download")
-        
-        for i, file_info in enumerate(audio_files):
-            filename = file_info.get('name')
-            if not filename:
-                continue
-            
-            print(f"[DEBUG] Processing file {i+1}/{total_files}: {filename}")
-            
-            # Check if file already downloaded
-            existing_file = ArchiveFile.query.filter_by(
-                archive_item_id=archive_item.id,
-                name=filename
-            ).first()
-            
-            if existing_file and existing_file.is_downloaded:
-                print(f"[DEBUG] File already downloaded: {filename}")
-                downloaded_files.append(filename)
-                continue
-            
-            # Download file
-            print(f"[DEBUG] Downloading: {filename}")
-            local_path = archive_api.download_file(identifier, filename)
-            
-            if local_path:
-                # Create or update file record
-                if existing_file:
-                    existing_file.local_path = local_path
-                    existing_file.is_downloaded = True
-                    existing_file.download_date = datetime.utcnow()
-                else:
-                    archive_file = create_file_from_info(file_info, archive_item.id)
-                    archive_file.local_path = local_path
-                    archive_file.is_downloaded = True
-                    archive_file.download_date = datetime.utcnow()
-                    db.session.add(archive_file)
-                
-                downloaded_files.append(filename)
-                print(f"[DEBUG] Downloaded {i+1}/{total_files}: {filename}")
-            else:
-                failed_files.append(filename)
-                print(f"[DEBUG] Failed {i+1}/{total_files}: {filename}")
-        
-        # Update archive item backup status
-        archive_item.is_backed_up = True
-        archive_item.backup_date = datetime.utcnow()
-        
-        db.session.commit()
-        print(f"[DEBUG] Full backup completed: {len(downloaded_files)} downloaded, {len(failed_files)} failed")
+        job = enqueue_backup_job(identifier, 'full')
         
         return jsonify({
-            'message': 'Full backup completed successfully',
+            'message': 'Full backup queued',
             'identifier': identifier,
-            'downloaded_files': downloaded_files,
-            'failed_files': failed_files,
-            'total_downloaded': len(downloaded_files),
-            'total_failed': len(failed_files),
-            'total_files': total_files,
-            'reviews_count': len(reviews),
-            'storage_location': f'storage/files/{identifier}/'
-        })
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
-        print(f"[DEBUG] Exception in backup_full: {str(e)}")
-        import traceback
-        print(f"[DEBUG] Traceback: {traceback.format_exc()}")
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
@@ -346,9 +201,9 @@ def backup_status(identifier):
                 'backup_date': None
             })
         
-        # Count downloaded files
-        total_files = len(archive_item.files)
-        downloaded_files = len([f for f in archive_item.files if f.is_downloaded])
+        # Count downloaded files from the (archive_item_id, is_downloaded) index; the file rows
+        # themselves are left out (GET /api/metadata/<identifier> returns them)
+        total_files, downloaded_files = file_counts_by_item([archive_item.id]).get(archive_item.id, (0, 0))
         
         return jsonify({
             'identifier': identifier,
@@ -357,7 +212,7 @@ def backup_status(identifier):
             'backup_date': archive_item.backup_date.isoformat() if archive_item.backup_date else None,
             'total_files': total_files,
             'downloaded_files': downloaded_files,
-            'archive_item': archive_item.to_dict()
+            'archive_item': archive_item.to_dict(include_files=False)
         })
         
     except Exception as e:
@@ -369,14 +224,34 @@ def list_backups():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
+        
+        # ?cursor= (empty for the first page) switches to keyset paging
+        if cursor is not None:
+            keyset_page = keyset_paginate(ArchiveItem.query, newest_first(ArchiveItem), cursor=cursor,
+                                          per_page=per_page, count=request.args.get('count'))
+            items = keyset_page['items']
+            pagination_info = cursor_pagination_dict(keyset_page, per_page, cursor)
+        else:
+            pagination = order_by_keys(ArchiveItem.query, newest_first(ArchiveItem)).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            items = pagination.items
+            pagination_info = {
+                'page': page,
+                'per_page': per_page,
+                'total': pagination.total,
+                'pages': pagination.pages,
+                'has_prev': pagination.has_prev,
+                'has_next': pagination.has_next
+            }
         
-        pagination = ArchiveItem.query.order_by(ArchiveItem.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        # File counts for the whole page in one grouped query
+        file_counts = file_counts_by_item([item.id for item in items])
         
         backups = []
-        for item in pagination.items:
-            downloaded_files = len([f for f in item.files if f.is_downloaded])
+        for item in items:
+            total_files, downloaded_files = file_counts.get(item.id, (0, 0))
             backups.append({
                 'identifier': item.identifier,
                 'title': item.title,
@@ -385,22 +260,17 @@ def list_backups():
                 'creator': item.creator,
                 'is_backed_up': item.is_backed_up,
                 'backup_date': item.backup_date.isoformat() if item.backup_date else None,
-                'total_files': len(item.files),
+                'total_files': total_files,
                 'downloaded_files': downloaded_files
             })
         
         return jsonify({
             'backups': backups,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_prev': pagination.has_prev,
-                'has_next': pagination.has_next
-            }
+            'pagination': pagination_info
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -411,15 +281,20 @@ def list_backup_jobs():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        pagination = BackupJob.query.order_by(BackupJob.started_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        jobs = [job.to_dict() for job in pagination.items]
+        cursor = request.args.get('cursor')
         
-        return jsonify({
-            'jobs': jobs,
-            'pagination': {
+        # ?cursor= (empty for the first page) switches to keyset paging
+        if cursor is not None:
+            keyset_page = keyset_paginate(BackupJob.query, newest_first(BackupJob), cursor=cursor,
+                                          per_page=per_page, count=request.args.get('count'))
+            jobs = [job.to_dict() for job in keyset_page['items']]
+            pagination_info = cursor_pagination_dict(keyset_page, per_page, cursor)
+        else:
+            pagination = order_by_keys(BackupJob.query, newest_first(BackupJob)).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            jobs = [job.to_dict() for job in pagination.items]
+            pagination_info = {
                 'page': page,
                 'per_page': per_page,
                 'total': pagination.total,
@@ -427,11 +302,424 @@ def list_backup_jobs():
                 'has_prev': pagination.has_prev,
                 'has_next': pagination.has_next
             }
+        
+        return jsonify({
+            'jobs': jobs,
+            'pagination': pagination_info
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@backup_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_backup_job(job_id):
+    """Get status and progress of a backup job"""
+    try:
+        job = db.session.get(BackupJob, job_id)
+        if not job:
+            return jsonify({'error': 'Backup job not found'}), 404
+        
+        return jsonify(job.to_dict())
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/jobs/<int:job_id>/events', methods=['GET'])
+def backup_job_events(job_id):
+    """Stream a backup job's progress as server-sent events until it finishes.
+
+    Each change of the job row is sent as a `progress` event. A stream is held
+    for at most JOB_EVENTS_MAX_SECONDS so it does not pin a sync worker;
+    EventSource clients reconnect on their own and pick up where it left off.
+    """
+    try:
+        if db.session.get(BackupJob, job_id) is None:
+            return jsonify({'error': 'Backup job not found'}), 404
+        
+        interval = current_app.config.get('JOB_EVENTS_INTERVAL', 1.0)
+        max_seconds = current_app.config.get('JOB_EVENTS_MAX_SECONDS', 30)
+        
+        def generate():
+            deadline = time.monotonic() + max_seconds
+            last_payload = None
+            yield f"retry: {int(interval * 1000)}\n\n"
+            while True:
+                job = db.session.get(BackupJob, job_id)
+                payload = job.to_dict()
+                # End the read transaction so the next poll sees the worker's commits
+                db.session.rollback()
+                
+                if payload != last_payload:
+                    yield f"event: progress\ndata: {json.dumps(payload)}\n\n"
+                    last_payload = payload
+                if payload['status'] in ('completed', 'failed'):
+                    yield f"event: end\ndata: {json.dumps({'status': payload['status']})}\n\n"
+                    return
+                if time.monotonic() >= deadline:
+                    return
+                time.sleep(interval)
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def enqueue_backup_job(identifier, job_type):
+    """Create a BackupJob row and hand its pipeline to the task queue"""
+    from app.tasks import start_backup_pipeline
+    
+    job = BackupJob(identifier=identifier, job_type=job_type, status='pending')
+    db.session.add(job)
+    db.session.commit()
+    
+    async_result = start_backup_pipeline(job.id, job_type)
+    
+    # In eager mode the pipeline has already run in its own session
+    job.celery_task_id = async_result.id
+    db.session.commit()
+    
+    return job
+
+def save_item_metadata(identifier, metadata_response):
+    """Create or update the ArchiveItem for a metadata API response; returns (item, action)"""
+    # Lock the row so concurrent saves of one item move its rollup counts in turn
+    existing_metadata = ArchiveItem.query.filter_by(identifier=identifier).with_for_update().first()
+    rollup_before = item_contribution(existing_metadata)
+    
+    if existing_metadata:
+        changed = update_metadata_from_response(existing_metadata, metadata_response)
+        archive_item, action = existing_metadata, 'updated'
+    else:
+        archive_item = create_metadata_from_response(metadata_response)
+        db.session.add(archive_item)
+        archive_item, action, changed = archive_item, 'created', True
+    
+    # File rows are written in bulk and need the item's id
+    db.session.flush()
+    inserted, updated = sync_item_files(archive_item, metadata_response.get('files', []))
+    if not (changed or inserted or updated):
+        # Same document as stored: no index, rollup or facet work either
+        return archive_item, 'unchanged'
+    
+    index_item(archive_item)
+    apply_rollup_delta(rollup_before, item_contribution(archive_item))
+    clear_facet_cache()
+    return archive_item, action
+
+def refresh_item_metadata(archive_api, identifier, force=False):
+    """Bring a stored item's metadata up to date, skipping the download when it has not changed.
+
+    Checks item_last_updated first (a few bytes), then makes a conditional
+    GET with the ETag/Last-Modified of the last response; only a changed
+    document is saved. force fetches and compares the full document anyway.
+    Returns (archive_item, action, metadata_response) where action is
+    'created', 'updated' or 'unchanged' (metadata_response None), or
+    (archive_item, None, None) if Archive.org could not be reached.
+    """
+    archive_item = ArchiveItem.query.filter_by(identifier=identifier).first()
+    
+    if archive_item is not None and not force:
+        last_updated = archive_api.get_item_last_updated(identifier)
+        if last_updated is not None and last_updated == archive_item.item_last_updated:
+            return archive_item, 'unchanged', None
+    
+    conditional = archive_item is not None and not force
+    status_code, metadata_response, validators = archive_api.get_metadata_if_changed(
+        identifier,
+        etag=archive_item.metadata_etag if conditional else None,
+        last_modified=archive_item.metadata_last_modified if conditional else None
+    )
+    if status_code == 304:
+        return archive_item, 'unchanged', None
+    if not metadata_response:
+        return archive_item, None, None
+    
+    archive_item, action = save_item_metadata(identifier, metadata_response)
+    assign_changed(archive_item, {'metadata_etag': validators.get('etag'),
+                                  'metadata_last_modified': validators.get('last_modified')})
+    return archive_item, action, metadata_response
+
+def fetch_item_stats(archive_api, archive_item):
+    """Fetch rating/download stats from the search API and store them"""
+    search_results = archive_api.get_search_results(archive_api.item_stats_url([archive_item.identifier]))
+    return create_or_update_stats(archive_item, search_results)
+
+def refresh_all_stats(archive_api, batch_size=100, progress_callback=None):
+    """Refresh ratings and download stats of every stored item, a batch of items per scrape query.
+
+    Each batch is looked up with one OR-ed identifier query, then its stats
+    rows are inserted or updated in bulk; rows whose values did not change are
+    not written. Reviews (one metadata request each) are refetched only for
+    items whose num_reviews moved. progress_callback(processed, total) runs
+    after each batch is flushed. Returns a summary of counts.
+    """
+    total = ArchiveItem.query.count()
+    summary = Counter()
+    processed = 0
+    last_id = 0
+    while True:
+        items = db.session.query(ArchiveItem.id, ArchiveItem.identifier).filter(
+            ArchiveItem.id > last_id).order_by(ArchiveItem.id).limit(batch_size).all()
+        if not items:
+            break
+        last_id = items[-1].id
+        
+        search_results = archive_api.get_search_results(
+            archive_api.item_stats_url([identifier for _, identifier in items]), refresh=True)
+        if search_results is None:
+            print(f"Failed to fetch stats for {len(items)} items from {items[0].identifier}")
+            summary['failed'] += len(items)
+        else:
+            found = {data.get('identifier'): data for data in search_results.get('items', [])}
+            reviews_changed = write_batch_stats(items, found, summary)
+            
+            for identifier in reviews_changed:
+                archive_item, _, metadata_response = refresh_item_metadata(archive_api, identifier, force=True)
+                if metadata_response is not None:
+                    create_reviews_from_metadata(archive_item, metadata_response)
+                    summary['reviews_refreshed'] += 1
+        
+        processed += len(items)
+        db.session.flush()
+        if progress_callback:
+            progress_callback(processed, total)
+    
+    return {
+        'total_items': total,
+        'updated_count': summary['created'] + summary['updated'],
+        'created': summary['created'],
+        'updated': summary['updated'],
+        'unchanged': summary['unchanged'],
+        'missing': summary['missing'],
+        'failed': summary['failed'],
+        'reviews_refreshed': summary['reviews_refreshed']
+    }
+
+def write_batch_stats(items, found, summary):
+    """Bulk insert/update the stats rows of (id, identifier) items from scrape rows keyed by identifier.
+
+    Counts outcomes into summary and returns the identifiers whose
+    num_reviews changed. Items without a stats row yet are compared against
+    the reviews already stored, so a first run does not refetch every item.
+    """
+    existing = {
+        stats.archive_item_id: stats for stats in ArchiveItemStats.query.filter(
+            ArchiveItemStats.archive_item_id.in_([item_id for item_id, _ in items]))
+    }
+    unrated_ids = [item_id for item_id, _ in items if item_id not in existing]
+    stored_reviews = dict(db.session.query(ArchiveItemReview.archive_item_id, func.count(ArchiveItemReview.id))
+                          .filter(ArchiveItemReview.archive_item_id.in_(unrated_ids))
+                          .group_by(ArchiveItemReview.archive_item_id).all()) if unrated_ids else {}
+    now = datetime.utcnow()
+    new_rows = []
+    updated_rows = []
+    reviews_changed = []
+    for item_id, identifier in items:
+        search_data = found.get(identifier)
+        if search_data is None:
+            # Dark or removed upstream: keep the last known stats
+            summary['missing'] += 1
+            continue
+        
+        values = stats_values(search_data)
+        stats = existing.get(item_id)
+        if stats is None:
+            new_rows.append({'archive_item_id': item_id, **values, 'last_updated': now})
+            summary['created'] += 1
+            previous_reviews = stored_reviews.get(item_id, 0)
+        else:
+            changed = {column: value for column, value in values.items() if getattr(stats, column) != value}
+            if not changed:
+                summary['unchanged'] += 1
+                continue
+            updated_rows.append({'id': stats.id, **changed, 'last_updated': now})
+            summary['updated'] += 1
+            previous_reviews = stats.num_reviews
+        
+        if (values['num_reviews'] or 0) != (previous_reviews or 0):
+            reviews_changed.append(identifier)
+    
+    write_rows(ArchiveItemStats, new_rows, updated_rows)
+    return reviews_changed
+
+def audio_files_from_response(metadata_response):
+    """Files to back up from a metadata response"""
+    # Filter for MP3 files only (most efficient and universally allowed)
+    audio_extensions = ['.mp3']
+    files = metadata_response.get('files', [])
+    return [f for f in files if any(f.get('name', '').lower().endswith(ext) for ext in audio_extensions)]
+
+def download_item_files(archive_item, audio_files, progress_callback=None):
+    """Download files that are not backed up yet and record them.
+
+    Returns (downloaded, failed, already_downloaded) lists of file names. Downloads
+    run on the shared worker pool; every database write happens on this thread.
+    Existing rows are read in one query and results are written back in batches
+    of FILE_WRITE_BATCH rows, so large items do not cost a statement per file.
+    """
+    identifier = archive_item.identifier
+    downloaded_files = []
+    failed_files = []
+    already_downloaded = []
+    
+    # Work out what still needs downloading. Only ids and sizes are kept: progress
+    # callbacks commit, which would expire the loaded rows and reload each one on access
+    existing_ids = {}
+    existing_sizes = {}
+    downloaded_names = set()
+    for filename, existing_file in load_item_files(archive_item.id).items():
+        existing_ids[filename] = existing_file.id
+        existing_sizes[filename] = file_size(existing_file.size)
+        if existing_file.is_downloaded:
+            downloaded_names.add(filename)
+    
+    # Rollup counts move with each batch of rows written
+    item_rollup_keys = rollup_keys(archive_item)
+    rollup_delta = Counter()
+    
+    pending_files = []
+    for file_info in audio_files:
+        filename = file_info.get('name')
+        if not filename:
+            continue
+        
+        if filename in downloaded_names:
+            already_downloaded.append(filename)
+            continue
+        
+        pending_files.append(file_info)
+    
+    print(f"[DEBUG] Downloading {len(pending_files)} files for {identifier}")
+    
+    # Download concurrently; results come back on this thread for the DB writes
+    new_rows = []
+    updated_rows = []
+    download_manager = get_download_manager()
+    for file_info, local_path, checksums in download_manager.download_all(identifier, pending_files,
+                                                                          progress_callback=progress_callback,
+                                                                          host=archive_item.server):
+        filename = file_info.get('name')
+        
+        if local_path:
+            # Checksums were verified while streaming; keep them so later
+            # integrity checks never have to re-read the file
+            values = {
+                **verified_checksum_values(checksums),
+                'local_path': local_path,
+                'is_downloaded': True,
+                'download_date': datetime.utcnow()
+            }
+            
+            if filename in existing_ids:
+                updated_rows.append({'id': existing_ids[filename], **values})
+                size = existing_sizes[filename]
+            else:
+                new_row = {**file_values_from_info(file_info, archive_item.id), **values}
+                new_rows.append(new_row)
+                size = file_size(new_row['size'])
+                rollup_delta.update(file_count=1, total_bytes=size)
+            rollup_delta.update(downloaded_file_count=1, downloaded_bytes=size)
+            
+            downloaded_files.append(filename)
+        else:
+            failed_files.append(filename)
+            print(f"[DEBUG] Failed download: {identifier}/{filename}")
+        
+        if len(new_rows) + len(updated_rows) >= FILE_WRITE_BATCH:
+            write_file_rows(new_rows, updated_rows)
+            add_to_rollup(item_rollup_keys, rollup_delta)
+            new_rows, updated_rows, rollup_delta = [], [], Counter()
+    
+    write_file_rows(new_rows, updated_rows)
+    
+    # Update archive item backup status. The flag is flipped in one conditional
+    # UPDATE so only the worker that actually changes it counts the item
+    flipped = db.session.execute(
+        update(ArchiveItem)
+        .where(ArchiveItem.id == archive_item.id, ArchiveItem.is_backed_up.isnot(True))
+        .values(is_backed_up=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if flipped:
+        rollup_delta.update(backed_up_count=1)
+    add_to_rollup(item_rollup_keys, rollup_delta)
+    db.session.expire(archive_item, ['is_backed_up'])
+    archive_item.backup_date = datetime.utcnow()
+    
+    return downloaded_files, failed_files, already_downloaded
+
+def file_counts_by_item(item_ids):
+    """{item_id: (total_files, downloaded_files)} for a page of items from one grouped query"""
+    if not item_ids:
+        return {}
+    
+    rows = db.session.query(
+        ArchiveFile.archive_item_id,
+        func.count(ArchiveFile.id),
+        func.sum(case((ArchiveFile.is_downloaded.is_(True), 1), else_=0))
+    ).filter(ArchiveFile.archive_item_id.in_(item_ids)).group_by(ArchiveFile.archive_item_id)
+    
+    return {item_id: (total, int(downloaded or 0)) for item_id, total, downloaded in rows}
+
+def load_item_files(archive_item_id):
+    """All file rows of an item keyed by name, loaded in a single query"""
+    if archive_item_id is None:
+        return {}
+    return {f.name: f for f in ArchiveFile.query.filter_by(archive_item_id=archive_item_id)}
+
+def find_item_file(identifier, filename):
+    """The ArchiveFile named filename in an item, found through the (archive_item_id, name) index"""
+    return ArchiveFile.query.join(ArchiveItem, ArchiveItem.id == ArchiveFile.archive_item_id).filter(
+        ArchiveItem.identifier == identifier, ArchiveFile.name == filename).first()
+
+def write_file_rows(new_rows, updated_rows):
+    """INSERT new file rows and UPDATE existing ones (dicts carrying 'id') in batched statements"""
+    write_rows(ArchiveFile, new_rows, updated_rows)
+
+def write_rows(model, new_rows, updated_rows):
+    """INSERT new rows of a model and UPDATE existing ones by 'id', FILE_WRITE_BATCH rows per statement"""
+    for start in range(0, len(new_rows), FILE_WRITE_BATCH):
+        db.session.execute(insert(model), new_rows[start:start + FILE_WRITE_BATCH])
+    for start in range(0, len(updated_rows), FILE_WRITE_BATCH):
+        db.session.execute(update(model), updated_rows[start:start + FILE_WRITE_BATCH])
+
+def sync_item_files(archive_item, file_infos):
+    """Bring an item's file rows in line with an Archive.org files list.
+
+    New files are inserted and rows whose Archive.org fields changed are
+    updated, each in bulk; unchanged rows are not written at all. Returns
+    (inserted, updated) counts.
+    """
+    existing_files = load_item_files(archive_item.id)
+    new_rows = []
+    updated_rows = []
+    seen = set()
+    for file_info in file_infos:
+        filename = file_info.get('name')
+        if not filename or filename in seen:
+            continue
+        seen.add(filename)
+        
+        values = file_values_from_info(file_info, archive_item.id)
+        existing_file = existing_files.get(filename)
+        if existing_file is None:
+            new_rows.append(values)
+            continue
+        
+        changed = {key: value for key, value in values.items() if getattr(existing_file, key) != value}
+        if changed:
+            updated_rows.append({'id': existing_file.id, **changed})
+    
+    write_file_rows(new_rows, updated_rows)
+    
+    # Bulk statements bypass the relationship; reload it on next access
+    if new_rows or updated_rows:
+        db.session.expire(archive_item, ['files'])
+    return len(new_rows), len(updated_rows)
+
 def create_metadata_from_response(api_response):
     """Create ArchiveItem object from Archive.org response"""
     identifier = api_response.get('metadata', {}).get('identifier', '')
@@ -450,70 +738,70 @@ def create_metadata_from_response(api_response):
     archive_item.uniq = api_response.get('uniq')
     archive_item.workable_servers_list = api_response.get('workable_servers', [])
     
-    # Store complete metadata as JSON
+    # Store complete metadata as JSON; file rows are bulk-written by sync_item_files
     archive_item.metadata_dict = api_response.get('metadata', {})
     
-    # Add files
-    files = api_response.get('files', [])
-    for file_info in files:
-        archive_file = create_file_from_info(file_info, None)  # Will be set when archive_item is saved
-        archive_item.files.append(archive_file)
-    
     return archive_item
 
 def update_metadata_from_response(archive_item, api_response):
-    """Update existing ArchiveItem object from Archive.org response"""
+    """Update existing ArchiveItem object from Archive.org response.
+
+    Only fields whose values differ are assigned, so an unchanged item is not
+    written at all. Returns True if anything changed.
+    """
     
     # Update top-level API fields
-    archive_item.created = api_response.get('created')
-    archive_item.d1 = api_response.get('d1')
-    archive_item.d2 = api_response.get('d2')
-    archive_item.dir = api_response.get('dir')
-    archive_item.files_count = api_response.get('files_count')
-    archive_item.item_last_updated = api_response.get('item_last_updated')
-    archive_item.item_size = api_response.get('item_size')
-    archive_item.server = api_response.get('server')
-    archive_item.uniq = api_response.get('uniq')
-    archive_item.workable_servers_list = api_response.get('workable_servers', [])
+    changed = assign_changed(archive_item, {
+        field: api_response.get(field) for field in ITEM_RESPONSE_FIELDS
+    })
+    if archive_item.workable_servers_list != (api_response.get('workable_servers') or []):
+        archive_item.workable_servers_list = api_response.get('workable_servers', [])
+        changed = True
     
     # Update complete metadata as JSON
-    archive_item.metadata_dict = api_response.get('metadata', {})
-    archive_item.updated_at = datetime.utcnow()
+    metadata = api_response.get('metadata', {})
+    if archive_item.metadata_dict != (metadata or {}):
+        archive_item.metadata_dict = metadata
+        changed = True
+    
+    if changed:
+        archive_item.updated_at = datetime.utcnow()
+    return changed
 
-def create_file_from_info(file_info, archive_item_id):
-    """Create ArchiveFile object from file info"""
-    archive_file = ArchiveFile()
-    archive_file.archive_item_id = archive_item_id
-    
-    # Core Archive.org fields
-    archive_file.name = file_info.get('name')
-    archive_file.source = file_info.get('source')
-    archive_file.format = file_info.get('format')
-    archive_file.mtime = file_info.get('mtime')
-    archive_file.size = file_info.get('size')
-    archive_file.md5 = file_info.get('md5')
-    archive_file.crc32 = file_info.get('crc32')
-    archive_file.sha1 = file_info.get('sha1')
-    
-    # Optional fields
-    archive_file.length = file_info.get('length')
-    archive_file.height = file_info.get('height')
-    archive_file.width = file_info.get('width')
-    archive_file.track = file_info.get('track')
-    archive_file.album = file_info.get('album')
-    archive_file.artist = file_info.get('artist')
-    archive_file.title = file_info.get('title')
-    archive_file.bitrate = file_info.get('bitrate')
-    archive_file.creator = file_info.get('creator')
+def assign_changed(obj, values):
+    """Set only the attributes whose value differs; returns True if any did"""
+    changed = False
+    for field, value in values.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed = True
+    return changed
+
+def verified_checksum_values(checksums):
+    """Column values for the md5/sha1/crc32 computed while downloading a file"""
+    if not checksums:
+        return {}
+    
+    return {
+        'md5': checksums.get('md5'),
+        'sha1': checksums.get('sha1'),
+        'crc32': checksums.get('crc32')
+    }
+
+def file_values_from_info(file_info, archive_item_id):
+    """ArchiveFile column values from Archive.org file info, for bulk INSERT/UPDATE"""
+    values = {field: file_info.get(field) for field in ARCHIVE_FILE_FIELDS}
+    values['archive_item_id'] = archive_item_id
     
     # Convert string 'true'/'false' to boolean
     private_value = file_info.get('private', False)
     if isinstance(private_value, str):
-        archive_file.private = private_value.lower() == 'true'
+        values['private'] = private_value.lower() == 'true'
     else:
-        archive_file.private = bool(private_value)
-    
-    archive_file.rotation = file_info.get('rotation')
-    archive_file.summation = file_info.get('summation')
+        values['private'] = bool(private_value)
     
-    return archive_file 
\ No newline at end of file
+    return values
+
+def create_file_from_info(file_info, archive_item_id):
+    """Create ArchiveFile object from file info"""
+    return ArchiveFile(**file_values_from_info(file_info, archive_item_id))
@@ -0,0 +1,62 @@
+import hashlib
+import zlib
+from typing import Optional, Dict, Any, List
+
+# Digests Archive.org publishes for every file, in the order they are checked
+CHECKSUM_FIELDS = ('md5', 'sha1', 'crc32')
+
+
+class FileDigest:
+    """md5/sha1/crc32 computed incrementally over a file's bytes as they are written.
+
+    Expected values come from the Archive.org files list; whichever are present
+    are checked once the download completes, so a corrupt transfer is rejected
+    without ever re-reading the file from disk.
+    """
+
+    def __init__(self, expected: Optional[Dict[str, Any]] = None):
+        self.expected = {
+            field: str(expected[field]).strip().lower()
+            for field in CHECKSUM_FIELDS
+            if expected and expected.get(field)
+        }
+        self.reset()
+
+    @classmethod
+    def from_file_info(cls, file_info: Dict[str, Any]) -> 'FileDigest':
+        """Build a digest expecting the checksums listed in Archive.org file info"""
+        return cls(expected={field: file_info.get(field) for field in CHECKSUM_FIELDS})
+
+    def reset(self):
+        self._md5 = hashlib.md5()
+        self._sha1 = hashlib.sha1()
+        self._crc32 = 0
+        self.length = 0
+
+    def update(self, chunk: bytes):
+        self._md5.update(chunk)
+        self._sha1.update(chunk)
+        self._crc32 = zlib.crc32(chunk, self._crc32)
+        self.length += len(chunk)
+
+    def update_from_file(self, path: str, chunk_size: int = 64 * 1024):
+        """Feed bytes already on disk (used when resuming a partial download)"""
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                self.update(chunk)
+
+    def hexdigests(self) -> Dict[str, str]:
+        """Computed digests in Archive.org's format (lowercase hex, crc32 zero-padded)"""
+        return {
+            'md5': self._md5.hexdigest(),
+            'sha1': self._sha1.hexdigest(),
+            'crc32': f'{self._crc32 & 0xffffffff:08x}'
+        }
+
+    def mismatches(self) -> List[str]:
+        """Names of expected checksums that do not match the bytes seen"""
+        computed = self.hexdigests()
+        return [field for field, value in self.expected.items() if computed[field] != value]
@@ -0,0 +1,214 @@
+import os
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Callable, Iterator, Tuple
+
+from flask import current_app
+
+from app.api.archive_api import ArchiveAPI, get_archive_api
+from app.api.checksums import FileDigest
+
+
+def file_size(file_info: Dict[str, Any]) -> int:
+    """Size in bytes from Archive.org file info (sent as a string), 0 if unknown"""
+    try:
+        return int(file_info.get('size') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ItemProgress:
+    """Aggregated download progress for all files of one archive item"""
+
+    def __init__(self, identifier: str, file_infos: List[Dict[str, Any]]):
+        self.identifier = identifier
+        self.total_files = len(file_infos)
+        self.completed_files = 0
+        self.failed_files = 0
+        self._sizes = {f.get('name'): file_size(f) for f in file_infos}
+        self._fractions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @property
+    def downloaded_bytes(self) -> int:
+        with self._lock:
+            return int(sum(self._sizes.get(name, 0) * fraction for name, fraction in self._fractions.items()))
+
+    @property
+    def fraction(self) -> float:
+        total = self.total_bytes
+        if total > 0:
+            return self.downloaded_bytes / total
+        return (self.completed_files / self.total_files) if self.total_files else 1.0
+
+    def update(self, filename: str, fraction: float):
+        with self._lock:
+            self._fractions[filename] = fraction
+
+    def finish(self, filename: str, success: bool):
+        with self._lock:
+            if success:
+                self._fractions[filename] = 1.0
+                self.completed_files += 1
+            else:
+                self.failed_files += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'identifier': self.identifier,
+            'total_files': self.total_files,
+            'completed_files': self.completed_files,
+            'failed_files': self.failed_files,
+            'total_bytes': self.total_bytes,
+            'downloaded_bytes': self.downloaded_bytes,
+            'progress': round(self.fraction, 4)
+        }
+
+
+class HostLimit:
+    """Caps open connections to one host; a segmented download holds one permit per segment.
+
+    Callers are served in arrival order, so a file waiting for several permits
+    is not starved by single-connection files queued behind it.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self._next_ticket = 0
+        self._serving = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def hold(self, permits: int = 1) -> Iterator[int]:
+        """Take permits (at most the limit) for the duration of the block; yields how many were taken"""
+        permits = min(max(1, permits), self.limit)
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: ticket == self._serving and self.in_use + permits <= self.limit)
+            self.in_use += permits
+            self._serving += 1
+            self._condition.notify_all()
+        try:
+            yield permits
+        finally:
+            with self._condition:
+                self.in_use -= permits
+                self._condition.notify_all()
+
+
+class DownloadManager:
+    """Bounded worker pool that downloads an item's files concurrently.
+
+    Workers only touch the network and the filesystem. Results are handed
+    back to the calling thread, which owns the SQLAlchemy session and does
+    all database writes.
+    """
+
+    def __init__(self, archive_api: ArchiveAPI, max_workers: int = 4, per_host_limit: int = 4):
+        self.archive_api = archive_api
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download')
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, archive_api: ArchiveAPI, config) -> 'DownloadManager':
+        """Build a download manager from Flask config values"""
+        return cls(
+            archive_api,
+            max_workers=config.get('DOWNLOAD_WORKERS', 4),
+            per_host_limit=config.get('DOWNLOAD_PER_HOST_LIMIT', 4)
+        )
+
+    def download_all(self, identifier: str, file_infos: List[Dict[str, Any]],
+                     progress: Optional[ItemProgress] = None,
+                     progress_callback: Optional[Callable[[ItemProgress], None]] = None,
+                     host: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, str]]]]:
+        """Download files concurrently, yielding (file_info, local_path, checksums) as each one finishes.
+
+        checksums holds the md5/sha1/crc32 computed while streaming and already
+        verified against file_info. local_path and checksums are None for failed
+        or corrupt downloads. The generator runs on the caller's thread, so it is
+        safe to write to the database while consuming it.
+
+        host is the data server holding the item (its metadata `server`);
+        archive.org/download redirects there, so per_host_limit counts against it.
+        """
+        if progress is None:
+            progress = ItemProgress(identifier, file_infos)
+
+        futures = {
+            self._executor.submit(self._download_one, identifier, file_info, progress, host): file_info
+            for file_info in file_infos
+        }
+
+        for future in as_completed(futures):
+            file_info = futures[future]
+            try:
+                local_path, checksums = future.result()
+            except Exception as e:
+                print(f"[DownloadManager] Worker error for {identifier}/{file_info.get('name')}: {str(e)}")
+                local_path, checksums = None, None
+
+            progress.finish(file_info.get('name'), local_path is not None)
+            if progress_callback:
+                progress_callback(progress)
+
+            yield file_info, local_path, checksums
+
+    def shutdown(self):
+        """Stop accepting work and wait for running downloads"""
+        self._executor.shutdown(wait=True)
+
+    def _download_one(self, identifier: str, file_info: Dict[str, Any],
+                      progress: ItemProgress, host: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+        filename = file_info.get('name')
+        digest = FileDigest.from_file_info(file_info)
+
+        def on_progress(fraction: float):
+            progress.update(filename, fraction)
+
+        # Large files open several range connections; each counts against the host's limit
+        expected_size = file_size(file_info) or None
+        host_limit = self._host_limit(host or self._download_host(identifier, filename))
+        with host_limit.hold(self.archive_api.segment_count(expected_size)) as connections:
+            local_path = self.archive_api.download_file(identifier, filename, progress_callback=on_progress,
+                                                        expected_size=expected_size, digest=digest,
+                                                        segments=connections)
+
+        return local_path, (digest.hexdigests() if local_path else None)
+
+    def _download_host(self, identifier: str, filename: str) -> str:
+        """Host of the download URL, for items whose data server is not known"""
+        return urllib.parse.urlparse(self.archive_api.download_url(identifier, filename) or '').netloc
+
+    def _host_limit(self, host: str) -> HostLimit:
+        with self._host_lock:
+            host_limit = self._host_limits.get(host)
+            if host_limit is None:
+                host_limit = HostLimit(self.per_host_limit)
+                self._host_limits[host] = host_limit
+            return host_limit
+
+
+def get_download_manager() -> DownloadManager:
+    """Return the process-wide download manager, sharing its pool and per-host limits"""
+    manager = current_app.extensions.get('download_manager')
+
+    # Thread pools do not survive fork, so each gunicorn worker builds its own
+    if manager is None or manager.pid != os.getpid():
+        manager = DownloadManager.from_config(get_archive_api(), current_app.config)
+        current_app.extensions['download_manager'] = manager
+
+    return manager
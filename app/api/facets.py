@@ -0,0 +1,86 @@
+from typing import Optional, Dict, List, Tuple, Any
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.models.show_metadata import ArchiveItem
+from app.api.ttl_cache import TTLCache
+
+# Facets shown on the browse page, each counted over an indexed show column
+FACET_COLUMNS = {
+    'year': ArchiveItem.show_year,
+    'creator': ArchiveItem.show_creator,
+    'venue': ArchiveItem.show_venue
+}
+
+
+class FacetCache(TTLCache):
+    """Facet counts per filter combination, kept for ttl seconds (LRU, per worker process)"""
+
+    @classmethod
+    def from_config(cls, config) -> 'FacetCache':
+        return cls(ttl=config.get('FACET_CACHE_SECONDS', 60),
+                   max_entries=config.get('FACET_CACHE_SIZE', 256))
+
+
+def get_facet_cache() -> FacetCache:
+    """Return the process-wide facet cache"""
+    cache = current_app.extensions.get('facet_cache')
+    if cache is None:
+        cache = FacetCache.from_config(current_app.config)
+        current_app.extensions['facet_cache'] = cache
+    return cache
+
+
+def clear_facet_cache():
+    """Drop cached counts after items change (other workers catch up within the TTL)"""
+    cache = current_app.extensions.get('facet_cache')
+    if cache is not None:
+        cache.clear()
+
+
+def filtered_items(search_term: Optional[str] = None, filters: Optional[Dict[str, Any]] = None):
+    """ArchiveItem query narrowed by a search term and exact facet values"""
+    from app.api.search_routes import filter_local_items
+
+    query, sort_keys = filter_local_items(ArchiveItem.query, search_term=search_term)
+    for facet, value in (filters or {}).items():
+        if value not in (None, ''):
+            query = query.filter(FACET_COLUMNS[facet] == value)
+    return query, sort_keys
+
+
+def facet_counts(search_term: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                 limit: Optional[int] = None) -> Dict[str, List[Tuple[Any, int]]]:
+    """{facet: [(value, item count), ...]} for the items matching the current filters.
+
+    Each facet is counted with every filter applied except its own, so a
+    selected year still lists the other years to switch to. One grouped query
+    per facet; years come back in order, creators and venues most common first
+    (at most `limit` of them). Results are cached per filter combination.
+    """
+    filters = {facet: value for facet, value in (filters or {}).items() if value not in (None, '')}
+    if limit is None:
+        limit = current_app.config.get('FACET_LIMIT', 100)
+
+    cache = get_facet_cache()
+    cache_key = ((search_term or '').strip().lower(), tuple(sorted(filters.items())), limit)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    counts = {}
+    for facet, column in FACET_COLUMNS.items():
+        other_filters = {name: value for name, value in filters.items() if name != facet}
+        query, _ = filtered_items(search_term, other_filters)
+
+        item_count = func.count(ArchiveItem.id)
+        grouped = query.with_entities(column, item_count).filter(column.isnot(None)).group_by(column)
+        if facet == 'year':
+            counts[facet] = grouped.order_by(column).all()
+        else:
+            counts[facet] = grouped.order_by(item_count.desc(), column).limit(limit).all()
+
+    counts = {facet: [tuple(row) for row in rows] for facet, rows in counts.items()}
+    cache.set(cache_key, counts)
+    return counts
@@ -0,0 +1,170 @@
+import html
+import re
+from typing import Optional, Dict, List
+
+from sqlalchemy import event, text, Integer, Float, or_
+
+from app.models.show_metadata import db, ArchiveItem, ArchiveItemReview
+
+# One row per archive item. SQLite: an FTS5 virtual table keyed by rowid = item id.
+# PostgreSQL: a weighted tsvector per item with a GIN index.
+FTS_TABLE = 'archive_item_fts'
+
+# Indexed fields in column order, with the weight each carries in the ranking
+FTS_FIELDS = ('title', 'venue', 'coverage', 'description', 'notes', 'reviews')
+SQLITE_BM25_WEIGHTS = (10.0, 8.0, 4.0, 2.0, 2.0, 1.0)
+POSTGRES_WEIGHTS = {'title': 'A', 'venue': 'A', 'coverage': 'B', 'description': 'C', 'notes': 'C', 'reviews': 'D'}
+POSTGRES_CONFIG = 'english'
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(FTS_FIELDS)}, tokenize='porter unicode61 remove_diacritics 2')"
+]
+POSTGRES_DDL = [
+    f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+    "archive_item_id INTEGER PRIMARY KEY REFERENCES archive_items(id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS ix_{FTS_TABLE}_document ON {FTS_TABLE} USING GIN (document)"
+]
+
+
+def fulltext_ddl(dialect_name: str) -> List[str]:
+    """Statements creating the full-text index for a database dialect (none if unsupported)"""
+    if dialect_name == 'sqlite':
+        return SQLITE_DDL
+    if dialect_name == 'postgresql':
+        return POSTGRES_DDL
+    return []
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_fulltext_index(target, connection, **kwargs):
+    # db.create_all() (tests, `flask deploy`) gets the same index migrations build
+    for statement in fulltext_ddl(connection.dialect.name):
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_fulltext_index(target, connection, **kwargs):
+    if fulltext_ddl(connection.dialect.name):
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def _plain_text(value) -> str:
+    """Flatten a metadata value (string, list, HTML description) to plain text"""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(_plain_text(v) for v in value)
+    value = re.sub(r'<[^>]+>', ' ', str(value))
+    return re.sub(r'\s+', ' ', html.unescape(value)).strip()
+
+
+def search_document(archive_item: ArchiveItem, reviews: Optional[List[ArchiveItemReview]] = None) -> Dict[str, str]:
+    """Text of each indexed field for an item; reviews are loaded if not given"""
+    metadata = archive_item.metadata_dict
+    if reviews is None:
+        reviews = ArchiveItemReview.query.filter_by(archive_item_id=archive_item.id).all()
+
+    return {
+        'title': _plain_text(metadata.get('title')),
+        'venue': _plain_text(metadata.get('venue')),
+        'coverage': _plain_text(metadata.get('coverage')),
+        'description': _plain_text(metadata.get('description')),
+        'notes': _plain_text(metadata.get('notes')),
+        'reviews': ' '.join(_plain_text([r.reviewtitle, r.reviewbody]) for r in reviews)
+    }
+
+
+def index_item(archive_item: ArchiveItem, reviews: Optional[List[ArchiveItemReview]] = None):
+    """Replace an item's full-text entry; call whenever its metadata or reviews change"""
+    dialect = db.engine.dialect.name
+    if archive_item.id is None:
+        db.session.flush()
+    document = search_document(archive_item, reviews)
+
+    if dialect == 'sqlite':
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': archive_item.id})
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_FIELDS)}) "
+                 f"VALUES (:id, {', '.join(':' + field for field in FTS_FIELDS)})"),
+            {'id': archive_item.id, **document}
+        )
+    elif dialect == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', :{field}), '{POSTGRES_WEIGHTS[field]}')"
+            for field in FTS_FIELDS
+        )
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (archive_item_id, document) VALUES (:id, {vector}) "
+                 "ON CONFLICT (archive_item_id) DO UPDATE SET document = EXCLUDED.document"),
+            {'id': archive_item.id, **document}
+        )
+
+
+def _fts5_query(search_term: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r'\w+', search_term)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def fulltext_filter(query, search_term: str):
+    """Restrict an ArchiveItem query to full-text matches of search_term.
+
+    Returns (query, rank) where rank is a lower-is-better relevance column to
+    sort on, or None when the database has no full-text index and the show
+    columns are matched instead.
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        match = _fts5_query(search_term)
+        if match is None:
+            return query, None
+        weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        # bm25() is already lower-is-better
+        ranked = text(
+            f"SELECT rowid AS item_id, bm25({FTS_TABLE}, {weights}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        ).bindparams(match=match).columns(item_id=Integer, rank=Float).subquery('fts')
+        return query.join(ranked, ranked.c.item_id == ArchiveItem.id), ranked.c.rank
+
+    if dialect == 'postgresql':
+        ranked = text(
+            f"SELECT archive_item_id AS item_id, -ts_rank_cd(document, q) AS rank "
+            f"FROM {FTS_TABLE}, websearch_to_tsquery('{POSTGRES_CONFIG}', :search_term) AS q "
+            "WHERE document @@ q"
+        ).bindparams(search_term=search_term).columns(item_id=Integer, rank=Float).subquery('fts')
+        return query.join(ranked, ranked.c.item_id == ArchiveItem.id), ranked.c.rank
+
+    pattern = f'%{search_term}%'
+    return query.filter(or_(
+        ArchiveItem.show_title.ilike(pattern),
+        ArchiveItem.show_venue.ilike(pattern),
+        ArchiveItem.identifier.ilike(pattern)
+    )), None
+
+
+def rebuild_index(batch_size: int = 500) -> int:
+    """Re-index every item (after migrating, or if the index drifted); returns items indexed"""
+    indexed = 0
+    last_id = 0
+    while True:
+        items = ArchiveItem.query.filter(ArchiveItem.id > last_id).order_by(ArchiveItem.id).limit(batch_size).all()
+        if not items:
+            break
+
+        # Load the batch's reviews in one query instead of one per item
+        reviews = {}
+        for review in ArchiveItemReview.query.filter(ArchiveItemReview.archive_item_id.in_([i.id for i in items])):
+            reviews.setdefault(review.archive_item_id, []).append(review)
+
+        for item in items:
+            index_item(item, reviews.get(item.id, []))
+        last_id = items[-1].id
+        indexed += len(items)
+        db.session.commit()
+
+    return indexed
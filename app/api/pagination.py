@@ -0,0 +1,131 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import and_, or_, false
+
+from app.models.show_metadata import db
+
+# Sort keys are (column expression, descending) pairs; the last one must be unique (an id)
+SortKeys = List[Tuple[Any, bool]]
+
+
+def newest_first(model) -> SortKeys:
+    """The default list order: newest created_at first, id breaking ties"""
+    return [(model.created_at, True), (model.id, True)]
+
+
+def order_by_keys(query, sort_keys: SortKeys):
+    """ORDER BY the sort keys, NULLs last in either direction (as keyset paging assumes)"""
+    return query.order_by(*[
+        (column.desc() if descending else column.asc()).nulls_last() for column, descending in sort_keys
+    ])
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque cursor holding the sort key values of the last row on a page"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'$dt': value.isoformat()}
+        raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+    raw = json.dumps(values, default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Sort key values from a cursor; raises ValueError for a malformed one"""
+    def object_hook(obj):
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        return obj
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw, object_hook=object_hook)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def _after(sort_keys: SortKeys, values: List[Any]):
+    """Rows strictly after the cursor row in sort order (NULLs sort last)"""
+    column, descending = sort_keys[0]
+    value = values[0]
+
+    if value is None:
+        # Only other NULLs follow a NULL, ordered by the remaining keys
+        beyond = false()
+        same = column.is_(None)
+    else:
+        beyond = or_(column < value if descending else column > value, column.is_(None))
+        same = column == value
+
+    if len(sort_keys) == 1:
+        return beyond
+    return or_(beyond, and_(same, _after(sort_keys[1:], values[1:])))
+
+
+def count_rows(query, mode: Optional[str]) -> Optional[int]:
+    """Total rows for a query: 'exact' counts, 'estimate' asks the planner (PostgreSQL), else None"""
+    if mode not in ('exact', 'estimate'):
+        return None
+
+    query = query.order_by(None)
+    if mode == 'estimate' and db.engine.dialect.name == 'postgresql':
+        compiled = query.statement.compile(dialect=db.engine.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    # SQLite has no usable row estimate; count exactly
+    return query.count()
+
+
+def keyset_paginate(query, sort_keys: SortKeys, cursor: Optional[str] = None, per_page: int = 20,
+                    count: Optional[str] = None) -> Dict[str, Any]:
+    """One page of an unordered query by keyset (seek) pagination.
+
+    Pages continue from the cursor row with a WHERE on the sort keys instead of
+    an OFFSET, so page 1000 costs the same as page 1 and rows inserted meanwhile
+    never shift a page. The total is only computed when count is 'exact' or
+    'estimate'. Returns {'items', 'next_cursor', 'has_next', 'total'}.
+    """
+    filtered = query
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(sort_keys):
+            raise ValueError('Invalid cursor')
+        query = query.filter(_after(sort_keys, values))
+
+    # Select the key values alongside each row so the next cursor can be built
+    rows = order_by_keys(query.add_columns(*[column for column, _ in sort_keys]), sort_keys) \
+        .limit(per_page + 1).all()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(list(rows[-1][1:])) if has_next and rows else None
+
+    return {
+        'items': [row[0] for row in rows],
+        'next_cursor': next_cursor,
+        'has_next': has_next,
+        'total': count_rows(filtered, count)
+    }
+
+
+def cursor_pagination_dict(page: Dict[str, Any], per_page: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """The 'pagination' block list endpoints return in cursor mode"""
+    return {
+        'mode': 'cursor',
+        'cursor': cursor or None,
+        'per_page': per_page,
+        'next_cursor': page['next_cursor'],
+        'has_next': page['has_next'],
+        'total': page['total']
+    }
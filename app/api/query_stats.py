@@ -0,0 +1,168 @@
+import heapq
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Tuple, Any
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.models.show_metadata import json_dumps
+
+# Collectors recording the queries run in the current context (a request, a count_queries block)
+_collectors: ContextVar[Tuple['QueryStats', ...]] = ContextVar('query_stats_collectors', default=())
+_listeners_installed = False
+
+# Expanded IN lists vary in length; "IN (?, ?, ?)" and "IN (?)" are the same statement shape
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL text with whitespace collapsed and bound-parameter lists folded to one placeholder"""
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class QueryStats:
+    """Queries counted in one context: how many, total time, repeats per statement shape and the slowest"""
+
+    def __init__(self, keep_slowest: int = 3):
+        self.count = 0
+        self.total_time = 0.0  # Seconds
+        self.shapes = Counter()
+        self.keep_slowest = keep_slowest
+        self._slowest: List[Tuple[float, int, str]] = []  # Min-heap of (seconds, sequence, statement)
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+        entry = (duration, self.count, statement)
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        """(seconds, statement) of the slowest queries, slowest first"""
+        return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes run more than threshold times, the likely N+1 loops"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total_time * 1000, 2),
+            'slowest': [{'ms': round(duration * 1000, 2), 'statement': statement[:500]}
+                        for duration, statement in self.slowest]
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_times')
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    for stats in _collectors.get():
+        stats.record(statement, duration)
+
+
+def install_query_listeners():
+    """Time every statement on every engine (idempotent); only active collectors pay for recording"""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _listeners_installed = True
+
+
+@contextmanager
+def count_queries(keep_slowest: int = 3) -> Iterator[QueryStats]:
+    """Count the queries run inside the block:
+
+        with count_queries() as stats:
+            client.get('/api/search/local')
+        assert stats.count <= 4, stats.shapes
+    """
+    install_query_listeners()
+    stats = QueryStats(keep_slowest)
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """Fail with the statement shapes that ran if the block issues more than limit queries"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        shapes = '\n'.join(f"  {count}x {shape[:200]}" for shape, count in stats.shapes.most_common())
+        raise AssertionError(f"Expected at most {limit} queries, ran {stats.count}:\n{shapes}")
+
+
+def server_timing(stats: QueryStats, request_time: float) -> str:
+    """Server-Timing header value: database time and query count, plus the whole request"""
+    return (f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries", '
+            f'app;dur={request_time * 1000:.1f}')
+
+
+def init_query_stats(app):
+    """Count queries per request: Server-Timing header, a JSON log line for slow requests, N+1 warnings"""
+    if not app.config.get('QUERY_STATS_ENABLED', True):
+        return
+    install_query_listeners()
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats(app.config.get('QUERY_STATS_SLOWEST', 3))
+        g.query_stats_started = time.perf_counter()
+        g.query_stats_token = _collectors.set(_collectors.get() + (g.query_stats,))
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        request_time = time.perf_counter() - g.query_stats_started
+
+        if app.config.get('QUERY_STATS_SERVER_TIMING', True):
+            response.headers['Server-Timing'] = server_timing(stats, request_time)
+
+        threshold = app.config.get('QUERY_STATS_REPEAT_THRESHOLD', 10)
+        repeated = stats.repeated(threshold)
+        for shape, count in repeated:
+            print(f"[QueryStats] Possible N+1 in {request.method} {request.path}: "
+                  f"statement ran {count} times: {shape[:300]}")
+
+        log_ms = app.config.get('QUERY_STATS_LOG_MS', 100)
+        if repeated or stats.total_time * 1000 >= log_ms:
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'request_ms': round(request_time * 1000, 2),
+                **stats.to_dict(),
+                'repeated': [{'count': count, 'statement': shape[:300]} for shape, count in repeated]
+            }
+            print(f"[QueryStats] {json_dumps(record)}")
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exc):
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            _collectors.reset(token)
@@ -0,0 +1,301 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+
+from app.models.show_metadata import json_loads, json_dumps
+
+# Responses are stored as JSON text, so every hit hands out a fresh object that
+# callers may modify freely. A stored null is a cached 404.
+MISS = (False, None)
+
+
+class ResponseCache:
+    """Base class for Archive.org response caches: JSON values by key with a per-entry TTL.
+
+    get() returns (hit, value); backends count hits, misses and evictions for
+    stats(). Keys are 'kind:url' strings built by ArchiveAPI.
+    """
+    backend = 'none'
+    shared = False  # Visible to other worker processes
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self.shared_fills = 0  # Values another worker fetched while this one waited
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        raw = self._get(key)
+        if raw is None:
+            self.misses += 1
+            return MISS
+        value = json_loads(raw)
+        if value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        self._set(key, json_dumps(value), ttl)
+        self.stores += 1
+
+    def delete(self, key: str):
+        self._delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'backend': self.backend,
+            'pid': self.pid,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'shared_fills': self.shared_fills,
+            'entries': self.entry_count()
+        }
+
+    def entry_count(self) -> Optional[int]:
+        return None
+
+    # Cross-worker single flight: the worker holding a key's fill lock fetches,
+    # the others poll the cache for its result. Only shared backends lock.
+    def acquire_fill_lock(self, key: str, token: str, ttl: float) -> bool:
+        return True
+
+    def release_fill_lock(self, key: str, token: str):
+        pass
+
+    def fill_lock_held(self, key: str) -> bool:
+        return False
+
+    def wait_for_fill(self, key: str, timeout: float, interval: float = 0.05) -> Tuple[bool, Any]:
+        """Poll for the value another worker is fetching until it lands, its lock goes or timeout passes"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            raw = self._get(key)
+            if raw is not None:
+                self.shared_fills += 1
+                return True, json_loads(raw)
+            if not self.fill_lock_held(key):
+                break
+            time.sleep(interval)
+        return MISS
+
+    def _get(self, key: str) -> Optional[str]:
+        return None
+
+    def _set(self, key: str, raw: str, ttl: float):
+        pass
+
+    def _delete(self, key: str):
+        pass
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU bounded by entry count and total bytes (one per worker)"""
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (expires_at, raw)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return raw
+
+    def _set(self, key, raw, ttl):
+        if len(raw) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, raw)
+            self.size += len(raw)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, raw = self._entries.pop(key)
+        self.size -= len(raw)
+
+    def entry_count(self):
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """LRU in a SQLite file shared by every worker on the host.
+
+    Each thread keeps its own connection. Access times are only rewritten once
+    they are a minute old, and expired or least recently used rows are trimmed
+    every EVICT_EVERY stores, so reads rarely take the write lock.
+    """
+    backend = 'sqlite'
+    shared = True
+    EVICT_EVERY = 64
+    TOUCH_AFTER = 60
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stores_since_evict = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS fill_locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key):
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, expires_at, accessed_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            connection.execute("DELETE FROM responses WHERE key = ? AND expires_at < ?", (key, now))
+            return None
+        if now - accessed_at > self.TOUCH_AFTER:
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def _set(self, key, raw, ttl):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, raw, now + ttl, now))
+
+        self._stores_since_evict += 1
+        if self._stores_since_evict >= self.EVICT_EVERY:
+            self._stores_since_evict = 0
+            self.evict(now)
+
+    def _delete(self, key):
+        self._connection().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def evict(self, now: Optional[float] = None):
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        connection = self._connection()
+        removed = connection.execute("DELETE FROM responses WHERE expires_at < ?", (now or time.time(),)).rowcount
+        removed += connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)).rowcount
+        self.evictions += removed
+
+    def entry_count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def acquire_fill_lock(self, key, token, ttl):
+        now = time.time()
+        connection = self._connection()
+        connection.execute("DELETE FROM fill_locks WHERE key = ? AND expires_at < ?", (key, now))
+        return connection.execute(
+            "INSERT OR IGNORE INTO fill_locks (key, token, expires_at) VALUES (?, ?, ?)",
+            (key, token, now + ttl)).rowcount == 1
+
+    def release_fill_lock(self, key, token):
+        self._connection().execute("DELETE FROM fill_locks WHERE key = ? AND token = ?", (key, token))
+
+    def fill_lock_held(self, key):
+        return self._connection().execute(
+            "SELECT 1 FROM fill_locks WHERE key = ? AND expires_at >= ?", (key, time.time())).fetchone() is not None
+
+
+class RedisCache(ResponseCache):
+    """Responses in Redis, shared by every worker and host; Redis expires keys and its maxmemory policy evicts"""
+    backend = 'redis'
+    shared = True
+    PREFIX = 'archive-response:'
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def _get(self, key):
+        raw = self.client.get(self.PREFIX + key)
+        return raw.decode() if raw is not None else None
+
+    def _set(self, key, raw, ttl):
+        self.client.set(self.PREFIX + key, raw, px=int(ttl * 1000))
+
+    def _delete(self, key):
+        self.client.delete(self.PREFIX + key)
+
+    LOCK_PREFIX = 'archive-fill-lock:'
+    # Delete the lock only if this worker still holds it
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def acquire_fill_lock(self, key, token, ttl):
+        return bool(self.client.set(self.LOCK_PREFIX + key, token, nx=True, px=int(ttl * 1000)))
+
+    def release_fill_lock(self, key, token):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.LOCK_PREFIX + key, token)
+
+    def fill_lock_held(self, key):
+        return bool(self.client.exists(self.LOCK_PREFIX + key))
+
+
+def response_cache_from_config(config) -> Optional[ResponseCache]:
+    """The cache ARCHIVE_CACHE_BACKEND names ('memory', 'sqlite', 'redis'), or None for 'none'"""
+    backend = (config.get('ARCHIVE_CACHE_BACKEND') or 'none').lower()
+    max_entries = config.get('ARCHIVE_CACHE_MAX_ENTRIES', 256)
+
+    if backend == 'memory':
+        return MemoryCache(max_entries=max_entries,
+                           max_bytes=config.get('ARCHIVE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    if backend == 'sqlite':
+        return SQLiteCache(config.get('ARCHIVE_CACHE_PATH') or 'archive_cache.db', max_entries=max_entries)
+    if backend == 'redis':
+        return RedisCache(config.get('ARCHIVE_CACHE_REDIS_URL') or 'redis://localhost:6379/0')
+    if backend != 'none':
+        raise ValueError(f"Unknown ARCHIVE_CACHE_BACKEND: {backend}")
+    return None
@@ -0,0 +1,186 @@
+from collections import Counter
+from typing import Dict, List, Tuple, Optional, Any
+
+from sqlalchemy import insert, update
+
+from app.models.show_metadata import db, ArchiveItem, ArchiveFile, StatsRollup
+
+# Counters every rollup row carries
+ROLLUP_COUNTERS = ('item_count', 'backed_up_count', 'file_count', 'downloaded_file_count',
+                   'total_bytes', 'downloaded_bytes')
+
+# Rows per executemany when rewriting the table
+ROLLUP_WRITE_BATCH = 500
+
+# (dimension, key), e.g. ('year', '1977') or ('all', '')
+RollupKey = Tuple[str, str]
+
+
+def file_size(value) -> int:
+    """Bytes from an Archive.org size string (0 if missing or malformed)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def rollup_keys(archive_item: ArchiveItem) -> List[RollupKey]:
+    """The rollup rows an item counts towards"""
+    keys = [('all', '')]
+    if archive_item.show_year is not None:
+        keys.append(('year', str(archive_item.show_year)))
+    if archive_item.show_creator:
+        keys.append(('creator', archive_item.show_creator))
+    for collection in dict.fromkeys(archive_item.collection or []):
+        if collection:
+            keys.append(('collection', str(collection)[:255]))
+    return keys
+
+
+def item_totals(archive_item: ArchiveItem, files=None) -> Counter:
+    """Counters an item adds to each of its rows; files are (size, is_downloaded) pairs, queried if not given"""
+    if files is None:
+        files = db.session.query(ArchiveFile.size, ArchiveFile.is_downloaded).filter_by(
+            archive_item_id=archive_item.id)
+
+    totals = Counter(item_count=1, backed_up_count=1 if archive_item.is_backed_up else 0)
+    for size, is_downloaded in files:
+        totals['file_count'] += 1
+        totals['total_bytes'] += file_size(size)
+        if is_downloaded:
+            totals['downloaded_file_count'] += 1
+            totals['downloaded_bytes'] += file_size(size)
+    return totals
+
+
+def item_contribution(archive_item: Optional[ArchiveItem]) -> Dict[RollupKey, Counter]:
+    """What an item currently adds to the rollup, keyed by row (empty for an unsaved item)"""
+    if archive_item is None or archive_item.id is None:
+        return {}
+    totals = item_totals(archive_item)
+    return {key: totals for key in rollup_keys(archive_item)}
+
+
+def apply_rollup_delta(before: Dict[RollupKey, Counter], after: Dict[RollupKey, Counter]):
+    """Move the rollup from one item_contribution() snapshot to another.
+
+    Take `before` ahead of changing an item and `after` once the change is
+    flushed; a changed year, creator or collection moves the item's counts
+    between rows.
+    """
+    for key in set(before) | set(after):
+        delta = Counter(after.get(key, {}))
+        delta.subtract(before.get(key, {}))
+        add_to_rollup([key], delta)
+
+
+def add_to_rollup(keys: List[RollupKey], delta: Dict[str, int]):
+    """Add counter deltas to rollup rows, creating rows that do not exist yet"""
+    delta = {counter: value for counter, value in delta.items() if value}
+    if not delta:
+        return
+
+    table = StatsRollup.__table__
+    dialect = db.engine.dialect.name
+    for dimension, key in keys:
+        values = {'dimension': dimension, 'key': key, **{c: delta.get(c, 0) for c in ROLLUP_COUNTERS}}
+
+        if dialect in ('postgresql', 'sqlite'):
+            # One atomic upsert, so concurrent workers never lose an increment
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            statement = upsert(table).values(**values)
+            statement = statement.on_conflict_do_update(
+                index_elements=['dimension', 'key'],
+                set_={counter: table.c[counter] + statement.excluded[counter] for counter in delta}
+            )
+            db.session.execute(statement)
+            continue
+
+        result = db.session.execute(
+            update(table).where(table.c.dimension == dimension, table.c.key == key)
+            .values({counter: table.c[counter] + value for counter, value in delta.items()})
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**values))
+
+
+def rebuild_rollup(batch_size: int = 500) -> int:
+    """Recompute the whole rollup from archive_items and archive_files; returns items counted.
+
+    The table is replaced in the final commit. Increments committed by backups
+    running meanwhile are overwritten, so run it while backups are idle.
+    """
+    totals: Dict[RollupKey, Counter] = {}
+    counted = 0
+    last_id = 0
+    while True:
+        items = ArchiveItem.query.filter(ArchiveItem.id > last_id).order_by(ArchiveItem.id).limit(batch_size).all()
+        if not items:
+            break
+
+        # The batch's file sizes in one query instead of one per item
+        files = {}
+        for item_id, size, is_downloaded in db.session.query(
+                ArchiveFile.archive_item_id, ArchiveFile.size, ArchiveFile.is_downloaded
+        ).filter(ArchiveFile.archive_item_id.in_([item.id for item in items])):
+            files.setdefault(item_id, []).append((size, is_downloaded))
+
+        for item in items:
+            counts = item_totals(item, files.get(item.id, []))
+            for key in rollup_keys(item):
+                totals.setdefault(key, Counter()).update(counts)
+        last_id = items[-1].id
+        counted += len(items)
+
+    rows = [
+        {'dimension': dimension, 'key': key, **{c: counts.get(c, 0) for c in ROLLUP_COUNTERS}}
+        for (dimension, key), counts in totals.items()
+    ]
+    db.session.execute(StatsRollup.__table__.delete())
+    for start in range(0, len(rows), ROLLUP_WRITE_BATCH):
+        db.session.execute(insert(StatsRollup), rows[start:start + ROLLUP_WRITE_BATCH])
+    db.session.commit()
+    return counted
+
+
+def rollup_rows(dimension: str, limit: Optional[int] = None) -> List[StatsRollup]:
+    """Non-empty rows of a dimension, most items first (years come back in year order)"""
+    query = StatsRollup.query.filter(StatsRollup.dimension == dimension, StatsRollup.item_count > 0)
+    if dimension == 'year':
+        rows = query.all()
+        return sorted(rows, key=lambda row: int(row.key))
+    query = query.order_by(StatsRollup.item_count.desc(), StatsRollup.key)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def library_totals() -> Dict[str, int]:
+    """The ('all', '') row as counters (zeros before anything is backed up)"""
+    row = StatsRollup.query.filter_by(dimension='all', key='').first()
+    return {counter: getattr(row, counter) if row else 0 for counter in ROLLUP_COUNTERS}
+
+
+def stats_summary(limit: int = 20) -> Dict[str, Any]:
+    """Library totals plus per-year, top creator and top collection breakdowns, read from the rollup"""
+    totals = library_totals()
+    total_items = totals['item_count']
+    fully_backed_up = totals['backed_up_count']
+
+    return {
+        'total_items': total_items,
+        'fully_backed_up': fully_backed_up,
+        'backup_percentage': (fully_backed_up / total_items * 100) if total_items > 0 else 0,
+        'year_stats': [{'year': int(row.key), **row.to_dict()} for row in rollup_rows('year')],
+        'creator_stats': [{'creator': row.key, **row.to_dict()} for row in rollup_rows('creator', limit)],
+        'collection_stats': [{'collection': row.key, **row.to_dict()} for row in rollup_rows('collection', limit)],
+        'file_stats': {
+            'total_files': totals['file_count'],
+            'downloaded_files': totals['downloaded_file_count'],
+            'total_bytes': totals['total_bytes'],
+            'downloaded_bytes': totals['downloaded_bytes']
+        }
+    }
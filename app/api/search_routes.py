@@ -1,10 +1,74 @@
-from flask import Blueprint, request, jsonify
-from app.api.archive_api import ArchiveAPI
-from app.models.show_metadata import ArchiveItem, db
-from sqlalchemy import or_, and_
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from app.api.archive_api import get_archive_api, DEFAULT_SCRAPE_FIELDS
+from app.models.show_metadata import ArchiveItem, ArchiveItemStats, db, json_dumps
+from app.api.fulltext import fulltext_filter
+from app.api.pagination import newest_first, order_by_keys, keyset_paginate, cursor_pagination_dict
+from app.api.backup_routes import file_counts_by_item
+from app.api.rollup import stats_summary
+from app.api.facets import facet_counts
+from sqlalchemy import or_, and_, func, exists, literal_column, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import selectinload
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import time
 
 search_bp = Blueprint('search', __name__)
 
+def metadata_text(key):
+    """item_metadata ->> key as text, spelled exactly like the expression indexes on it"""
+    if db.engine.dialect.name == 'postgresql':
+        return ArchiveItem.item_metadata.op('->>')(literal_column(f"'{key}'"))
+    return func.json_extract(ArchiveItem.item_metadata, literal_column(f"'$.{key}'"))
+
+def in_collection(collection):
+    """Items listing collection anywhere in metadata.collection (a string or a list)"""
+    if db.engine.dialect.name == 'postgresql':
+        # Containment is answered by the jsonb_path_ops GIN index
+        contains = ArchiveItem.item_metadata.op('@>', is_comparison=True)
+        return or_(contains(bindparam(None, {'collection': [collection]}, type_=JSONB)),
+                   contains(bindparam(None, {'collection': collection}, type_=JSONB)))
+    
+    collections = func.json_each(ArchiveItem.item_metadata, '$.collection').table_valued('value')
+    return exists().select_from(collections).where(collections.c.value == collection)
+
+def filter_local_items(query, search_term=None, venue=None, creator=None, min_rating=None,
+                       start_year=None, end_year=None, date=None, collection=None):
+    """Apply search filters to an ArchiveItem query using the full-text index and show columns.
+
+    Returns (query, sort_keys): newest first, behind relevance when searching text.
+    """
+    sort_keys = newest_first(ArchiveItem)
+    if search_term:
+        # Ranked full-text match over title, venue, coverage, description, notes and reviews
+        query, rank = fulltext_filter(query, search_term)
+        if rank is not None:
+            sort_keys = [(rank, False)] + sort_keys
+    
+    if venue:
+        query = query.filter(ArchiveItem.show_venue.ilike(f'%{venue}%'))
+    
+    if creator:
+        query = query.filter(ArchiveItem.show_creator.ilike(f'%{creator}%'))
+    
+    if min_rating is not None:
+        # Ratings come from the search API and live in archive_item_stats
+        query = query.join(ArchiveItemStats, ArchiveItemStats.archive_item_id == ArchiveItem.id).filter(
+            ArchiveItemStats.avg_rating >= min_rating)
+    
+    if start_year:
+        query = query.filter(ArchiveItem.show_year >= start_year)
+    
+    if end_year:
+        query = query.filter(ArchiveItem.show_year <= end_year)
+    
+    if date:
+        query = query.filter(metadata_text('date') == date)
+    
+    if collection:
+        query = query.filter(in_collection(collection))
+    
+    return query, sort_keys
+
 @search_bp.route('/archive', methods=['GET'])
 def search_archive():
     """Search Archive.org directly (proxy to Archive.org API)"""
@@ -18,8 +82,8 @@ def search_archive():
         sbd_only = request.args.get('sbd_only', 'false').lower() == 'true'
         collection = request.args.get('collection', 'GratefulDead')
         
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
+        # Shared Archive API client (pooled per worker)
+        archive_api = get_archive_api()
         
         # Build search URL
         search_url = archive_api.search_term_url(
@@ -47,6 +111,38 @@ def search_archive():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@search_bp.route('/archive/stream', methods=['GET'])
+def stream_archive_search():
+    """Stream every Archive.org result of a scrape query as newline-delimited JSON.
+
+    Takes a raw scrape query `q`, or a `collection` (and `sbd_only`) to list
+    whole. Result pages are fetched as the client reads, following the API's
+    cursors, so large listings never sit in memory. A page that fails mid-stream
+    ends it with an {"error": ...} line.
+    """
+    try:
+        query = request.args.get('q')
+        fields = request.args.get('fields') or DEFAULT_SCRAPE_FIELDS
+        archive_api = get_archive_api()
+        
+        if not query:
+            collection = request.args.get('collection')
+            if not collection:
+                return jsonify({'error': 'q or collection parameter is required'}), 400
+            query = archive_api.collection_query(collection, request.args.get('sbd_only', 'false').lower() == 'true')
+        
+        def generate():
+            try:
+                for item in archive_api.iter_scrape(query, fields):
+                    yield json_dumps(item) + '\n'
+            except LookupError as e:
+                yield json_dumps({'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @search_bp.route('/local', methods=['GET'])
 def search_local():
     """Search locally backed up archive items"""
@@ -58,42 +154,43 @@ def search_local():
         start_year = request.args.get('start_year', type=int)
         end_year = request.args.get('end_year', type=int)
         creator = request.args.get('creator')
+        date = request.args.get('date')
+        collection = request.args.get('collection')
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
+        
+        # Build query on the indexed show columns; ratings load for the whole page at once
+        query, sort_keys = filter_local_items(ArchiveItem.query.options(selectinload(ArchiveItem.stats)),
+                                              search_term=search_term, venue=venue, creator=creator,
+                                              min_rating=min_rating, start_year=start_year,
+                                              end_year=end_year, date=date, collection=collection)
+        
+        # ?cursor= (empty for the first page) switches to keyset paging
+        if cursor is not None:
+            keyset_page = keyset_paginate(query, sort_keys, cursor=cursor, per_page=per_page,
+                                          count=request.args.get('count'))
+            items = keyset_page['items']
+            pagination_info = cursor_pagination_dict(keyset_page, per_page, cursor)
+        else:
+            pagination = order_by_keys(query, sort_keys).paginate(page=page, per_page=per_page, error_out=False)
+            items = pagination.items
+            pagination_info = {
+                'page': page,
+                'per_page': per_page,
+                'total': pagination.total,
+                'pages': pagination.pages,
+                'has_prev': pagination.has_prev,
+                'has_next': pagination.has_next
+            }
         
-        # Build query
-        query = ArchiveItem.query
-        
-        # Apply filters - search within JSON metadata
-        if search_term:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{search_term}%'))
-        
-        if venue:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{venue}%'))
-        
-        if min_rating is not None:
-            # Note: For precise JSON filtering, would need database-specific JSON operators
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"avg_rating":"{min_rating}%'))
-        
-        if start_year:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"year":"{start_year}%'))
-        
-        if end_year:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"year":"{end_year}%'))
-        
-        if creator:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{creator}%'))
-        
-        # Order by created_at descending
-        query = query.order_by(ArchiveItem.created_at.desc())
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # File counts for the whole page in one grouped query
+        file_counts = file_counts_by_item([item.id for item in items])
         
         # Format results
         results = []
-        for item in pagination.items:
-            downloaded_files = len([f for f in item.files if f.is_downloaded])
+        for item in items:
+            total_files, downloaded_files = file_counts.get(item.id, (0, 0))
             results.append({
                 'identifier': item.identifier,
                 'title': item.title,
@@ -106,7 +203,7 @@ def search_local():
                 'metadata': item.metadata_dict,
                 'is_backed_up': item.is_backed_up,
                 'backup_date': item.backup_date.isoformat() if item.backup_date else None,
-                'total_files': len(item.files),
+                'total_files': total_files,
                 'downloaded_files': downloaded_files
             })
         
@@ -114,17 +211,12 @@ def search_local():
             'results': {
                 'items': results
             },
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_prev': pagination.has_prev,
-                'has_next': pagination.has_next
-            },
+            'pagination': pagination_info,
             'source': 'local'
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -141,8 +233,8 @@ def search_date_range():
         if not year:
             return jsonify({'error': 'Year parameter is required'}), 400
         
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
+        # Shared Archive API client (pooled per worker)
+        archive_api = get_archive_api()
         
         # Build search URL
         if month:
@@ -179,8 +271,8 @@ def get_year_total():
         if not year:
             return jsonify({'error': 'Year parameter is required'}), 400
         
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
+        # Shared Archive API client (pooled per worker)
+        archive_api = get_archive_api()
         
         # Build search URL
         search_url = archive_api.year_range_total_url(year, sbd_only, collection)
@@ -205,29 +297,30 @@ def get_year_total():
 def get_local_stats():
     """Get statistics about locally backed up archive items"""
     try:
-        # Total backed up items
-        total_items = ArchiveItem.query.count()
-        
-        # Fully backed up items (with files)
-        fully_backed_up = ArchiveItem.query.filter_by(is_backed_up=True).count()
-        
-        # Basic stats (JSON querying would be database-specific)
-        year_stats = []
-        creator_stats = []
+        # Read from the rollup table, so the cost does not grow with the library
+        return jsonify(stats_summary(limit=request.args.get('limit', 20, type=int)))
         
-        # Total file count (simplified)
-        file_stats = {
-            'total_files': 0,
-            'downloaded_files': 0
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@search_bp.route('/facets', methods=['GET'])
+def get_facets():
+    """Year, creator and venue counts for local items matching the given filters"""
+    try:
+        filters = {
+            'year': request.args.get('year', type=int),
+            'creator': request.args.get('creator'),
+            'venue': request.args.get('venue')
         }
+        facets = facet_counts(request.args.get('search_term'), filters,
+                              limit=request.args.get('limit', type=int))
         
         return jsonify({
-            'total_items': total_items,
-            'fully_backed_up': fully_backed_up,
-            'backup_percentage': (fully_backed_up / total_items * 100) if total_items > 0 else 0,
-            'year_stats': year_stats,
-            'creator_stats': creator_stats,
-            'file_stats': file_stats
+            'filters': {facet: value for facet, value in filters.items() if value not in (None, '')},
+            'facets': {
+                facet: [{'value': value, 'count': count} for value, count in rows]
+                for facet, rows in facets.items()
+            }
         })
         
     except Exception as e:
@@ -246,33 +339,35 @@ def search_hybrid():
         sbd_only = request.args.get('sbd_only', 'false').lower() == 'true'
         collection = request.args.get('collection', 'GratefulDead')
         
-        # Search local first
-        local_results = []
-        
-        # Build local query
-        query = ArchiveItem.query
-        
-        # Apply filters (simplified for JSON metadata)
-        if search_term:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{search_term}%'))
-        
-        if venue:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{venue}%'))
-        
-        if min_rating:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"avg_rating":"{min_rating}%'))
+        # Start the Archive.org search first so it runs while the local query does
+        archive_api = get_archive_api()
+        search_url = archive_api.search_term_url(
+            search_term=search_term,
+            venue=venue,
+            min_rating=min_rating,
+            start_year=start_year,
+            end_year=end_year,
+            sbd_only=sbd_only,
+            collection=collection
+        )
+        deadline = time.monotonic() + current_app.config.get('HYBRID_ARCHIVE_TIMEOUT', 3000) / 1000
+        archive_future = archive_api.search_async(search_url)
         
-        if start_year:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"year":"{start_year}%'))
+        local_results = []
         
-        if end_year:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"year":"{end_year}%'))
+        # Build local query on the indexed show columns; ratings load for all results at once
+        query, sort_keys = filter_local_items(ArchiveItem.query.options(selectinload(ArchiveItem.stats)),
+                                              search_term=search_term, venue=venue,
+                                              min_rating=request.args.get('min_rating', type=float),
+                                              start_year=request.args.get('start_year', type=int),
+                                              end_year=request.args.get('end_year', type=int))
         
         # Get local results
-        local_items = query.order_by(ArchiveItem.created_at.desc()).limit(20).all()
+        local_items = order_by_keys(query, sort_keys).limit(20).all()
         
+        file_counts = file_counts_by_item([item.id for item in local_items])
         for item in local_items:
-            downloaded_files = len([f for f in item.files if f.is_downloaded])
+            total_files, downloaded_files = file_counts.get(item.id, (0, 0))
             local_results.append({
                 'identifier': item.identifier,
                 'title': item.title,
@@ -285,24 +380,23 @@ def search_hybrid():
                 'metadata': item.metadata_dict,
                 'is_backed_up': item.is_backed_up,
                 'backup_date': item.backup_date.isoformat() if item.backup_date else None,
-                'total_files': len(item.files),
+                'total_files': total_files,
                 'downloaded_files': downloaded_files,
                 'result_source': 'local'
             })
         
-        # Search Archive.org
-        archive_api = ArchiveAPI()
-        search_url = archive_api.search_term_url(
-            search_term=search_term,
-            venue=venue,
-            min_rating=min_rating,
-            start_year=start_year,
-            end_year=end_year,
-            sbd_only=sbd_only,
-            collection=collection
-        )
-        
-        archive_results = archive_api.get_search_results(search_url)
+        # Wait for Archive.org only until the deadline; past it, answer with local results alone
+        archive_status = 'ok'
+        try:
+            archive_results = archive_future.result(timeout=max(0, deadline - time.monotonic()))
+            if archive_results is None:
+                archive_status = 'error'
+        except FutureTimeoutError:
+            print(f"[DEBUG] Hybrid search: Archive.org missed its deadline for {search_url}")
+            archive_results, archive_status = None, 'timeout'
+        except Exception as e:
+            print(f"[DEBUG] Hybrid search: Archive.org search failed: {str(e)}")
+            archive_results, archive_status = None, 'error'
         
         # Get local identifiers to avoid duplicates
         local_identifiers = set(result['identifier'] for result in local_results)
@@ -324,7 +418,9 @@ def search_hybrid():
             'local_count': len(local_results),
             'archive_count': len(combined_results) - len(local_results),
             'source': 'hybrid',
-            'search_url': search_url
+            'search_url': search_url,
+            'partial': archive_status != 'ok',
+            'archive_status': archive_status
         })
         
     except Exception as e:
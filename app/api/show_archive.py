@@ -0,0 +1,193 @@
+import hashlib
+import struct
+import tarfile
+import time
+import zlib
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Read size when copying member files into the stream
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+# Field values at or above this need ZIP64 records
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+ZIP_DATA_DESCRIPTOR = 0x08  # crc32 follows the data instead of preceding it
+ZIP_UTF8_NAME = 0x800
+
+
+class ArchiveMember(NamedTuple):
+    """One file going into a show archive; size and mtime come from a stat taken up front"""
+    name: str  # Path inside the archive
+    path: str  # File on disk
+    size: int
+    mtime: float
+
+
+def read_member(member: ArchiveMember, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    """Yield exactly `length` bytes of a member from `start`, failing if the file shrank meanwhile"""
+    remaining = member.size - start if length is None else length
+    with open(member.path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(ARCHIVE_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"{member.path} is shorter than the {member.size} bytes announced")
+            remaining -= len(chunk)
+            yield chunk
+
+
+def archive_etag(identifier: str, archive_format: str, members: List[ArchiveMember]) -> str:
+    """Strong ETag over the member list: names, sizes and mtimes fix every byte of the archive"""
+    digest = hashlib.sha1(f"{identifier}:{archive_format}".encode())
+    for member in members:
+        digest.update(f"\0{member.name}\0{member.size}\0{int(member.mtime)}".encode())
+    return digest.hexdigest()
+
+
+class TarStream:
+    """An uncompressed tar of members laid out in advance, so any byte range can be served.
+
+    The archive is a list of segments: header bytes built by tarfile, member
+    data read from disk when reached, and zero padding. Its length is known
+    before the first byte is sent.
+    """
+
+    def __init__(self, members: List[ArchiveMember]):
+        self.segments: List[Tuple[int, int, Union[bytes, ArchiveMember]]] = []
+        offset = 0
+        for member in members:
+            info = tarfile.TarInfo(member.name)
+            info.size = member.size
+            info.mtime = int(member.mtime)
+            info.mode = 0o644
+            header = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            offset = self._add(offset, header)
+            offset = self._add(offset, member, member.size)
+            padding = -member.size % tarfile.BLOCKSIZE
+            if padding:
+                offset = self._add(offset, b'\0' * padding)
+
+        # Two zero blocks end the archive, padded to a whole record as tarfile does
+        end = 2 * tarfile.BLOCKSIZE
+        end += -(offset + end) % tarfile.RECORDSIZE
+        self.length = self._add(offset, b'\0' * end)
+
+    def _add(self, offset: int, source: Union[bytes, ArchiveMember], length: Optional[int] = None) -> int:
+        length = len(source) if length is None else length
+        if length:
+            self.segments.append((offset, length, source))
+        return offset + length
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the archive bytes in [start, stop)"""
+        stop = self.length if stop is None else stop
+        for offset, length, source in self.segments:
+            if offset + length <= start:
+                continue
+            if offset >= stop:
+                break
+            first = max(start, offset) - offset
+            last = min(stop, offset + length) - offset
+            if isinstance(source, bytes):
+                yield source[first:last]
+            else:
+                yield from read_member(source, first, last - first)
+
+
+class ZipStream:
+    """An uncompressed (stored) zip of members, written front to back.
+
+    Each file's CRC-32 is computed while its bytes stream out and sent in a data
+    descriptor after them, so nothing is read twice. Every other field depends
+    only on names and sizes, which makes the total length known up front.
+    ZIP64 records are used only where a size, offset or count needs them.
+    """
+
+    def __init__(self, members: List[ArchiveMember]):
+        self.members = members
+        self.length = 0
+        offsets = []
+        for member in members:
+            offsets.append(self.length)
+            zip64 = member.size >= ZIP64_LIMIT
+            self.length += len(self._local_header(member, zip64)) + member.size + (24 if zip64 else 16)
+
+        central_size = sum(len(self._central_header(member, 0, offset)) for member, offset in zip(members, offsets))
+        self.length += central_size + len(self._end_records(len(members), self.length, central_size))
+
+    @staticmethod
+    def _encoded_name(member: ArchiveMember) -> Tuple[bytes, int]:
+        try:
+            return member.name.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return member.name.encode('utf-8'), ZIP_UTF8_NAME
+
+    @staticmethod
+    def _dos_time(mtime: float) -> Tuple[int, int]:
+        t = time.localtime(mtime)
+        if t.tm_year < 1980:
+            return 0, (1 << 5) | 1  # 1980-01-01 00:00, the earliest zip date
+        return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+                ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+    def _local_header(self, member: ArchiveMember, zip64: bool) -> bytes:
+        name, name_flag = self._encoded_name(member)
+        dos_time, dos_date = self._dos_time(member.mtime)
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0) if zip64 else b''
+        sizes = ZIP64_LIMIT if zip64 else 0
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, ZIP_DATA_DESCRIPTOR | name_flag, 0,
+                           dos_time, dos_date, 0, sizes, sizes, len(name), len(extra)) + name + extra
+
+    def _central_header(self, member: ArchiveMember, crc: int, offset: int) -> bytes:
+        name, name_flag = self._encoded_name(member)
+        dos_time, dos_date = self._dos_time(member.mtime)
+        zip64_values = []
+        size = member.size
+        if member.size >= ZIP64_LIMIT:
+            zip64_values += [member.size, member.size]
+            size = ZIP64_LIMIT
+        if offset >= ZIP64_LIMIT:
+            zip64_values.append(offset)
+            offset = ZIP64_LIMIT
+        extra = struct.pack(f'<HH{len(zip64_values)}Q', 1, 8 * len(zip64_values), *zip64_values) if zip64_values else b''
+        version = 45 if zip64_values else 20
+        return struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version,
+                           ZIP_DATA_DESCRIPTOR | name_flag, 0, dos_time, dos_date, crc, size, size,
+                           len(name), len(extra), 0, 0, 0, (0o100644 << 16), offset) + name + extra
+
+    @staticmethod
+    def _end_records(count: int, central_offset: int, central_size: int) -> bytes:
+        records = b''
+        if count >= ZIP64_COUNT_LIMIT or central_offset >= ZIP64_LIMIT or central_size >= ZIP64_LIMIT:
+            zip64_end_offset = central_offset + central_size
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count,
+                                   central_size, central_offset)
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+        return records + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, ZIP64_COUNT_LIMIT),
+                                     min(count, ZIP64_COUNT_LIMIT), min(central_size, ZIP64_LIMIT),
+                                     min(central_offset, ZIP64_LIMIT), 0)
+
+    def __iter__(self) -> Iterator[bytes]:
+        offset = 0
+        central = []
+        for member in self.members:
+            zip64 = member.size >= ZIP64_LIMIT
+            header = self._local_header(member, zip64)
+            yield header
+
+            crc = 0
+            for chunk in read_member(member):
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+
+            if zip64:
+                yield struct.pack('<IIQQ', 0x08074b50, crc, member.size, member.size)
+            else:
+                yield struct.pack('<IIII', 0x08074b50, crc, member.size, member.size)
+            central.append(self._central_header(member, crc, offset))
+            offset += len(header) + member.size + (24 if zip64 else 16)
+
+        central_size = sum(len(record) for record in central)
+        yield from central
+        yield self._end_records(len(self.members), offset, central_size)
@@ -0,0 +1,68 @@
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Call:
+    """One in-flight call that later callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs block and receive the same result (or exception). Nothing is kept
+    once the call returns, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run func once per key at a time; returns (result, shared).
+
+        shared is True whenever more than one caller received this result
+        object, so callers that modify it should copy it first.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waited = call.waiters > 0
+            call.done.set()
+        return call.result, waited
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'leaders': self.leaders, 'coalesced': self.coalesced, 'in_flight': in_flight}
@@ -0,0 +1,210 @@
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable
+
+from sqlalchemy import and_, or_, select, update
+
+from app.models.show_metadata import db, BackupWorkItem
+
+
+def new_claim_token() -> str:
+    """Identify one worker's claims: host, process and a random suffix"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _claimable(now: datetime):
+    """Rows nobody is working on: pending, or claimed with an expired lease"""
+    return or_(
+        BackupWorkItem.status == 'pending',
+        and_(BackupWorkItem.status == 'claimed', BackupWorkItem.lease_expires_at < now)
+    )
+
+
+def _insert_ignore_duplicates(rows: List[Dict[str, Any]]):
+    """INSERT rows, skipping any (identifier, file_name) another worker inserted first"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            db.session.add(BackupWorkItem(**row))
+        return
+
+    statement = insert(BackupWorkItem).on_conflict_do_nothing(index_elements=['identifier', 'file_name'])
+    db.session.execute(statement, rows)
+
+
+def enqueue_files(job_id: int, identifier: str, file_infos: Iterable[Dict[str, Any]],
+                  done_names: Iterable[str] = ()) -> int:
+    """Queue files of an item for download under a job; returns how many are waiting.
+
+    Files in done_names are already on disk and are marked done. Files another
+    worker currently holds a live lease on are left alone, so a second job for
+    the same show never downloads them twice.
+    """
+    now = datetime.utcnow()
+    done_names = set(done_names)
+    file_infos = {f.get('name'): f for f in file_infos if f.get('name')}
+
+    existing = {
+        item.file_name: item
+        for item in BackupWorkItem.query.filter(
+            BackupWorkItem.identifier == identifier,
+            BackupWorkItem.file_name.in_(list(file_infos))
+        )
+    }
+
+    new_rows = []
+    for name, file_info in file_infos.items():
+        status = 'done' if name in done_names else 'pending'
+        item = existing.get(name)
+        if item is None:
+            new_rows.append({
+                'job_id': job_id,
+                'identifier': identifier,
+                'file_name': name,
+                'file_info_json': json.dumps(file_info),
+                'status': status,
+                'attempts': 0,
+                'created_at': now,
+                'updated_at': now
+            })
+        elif item.status == 'claimed' and item.lease_expires_at and item.lease_expires_at >= now:
+            continue
+        elif item.status != status:
+            item.job_id = job_id
+            item.status = status
+            item.file_info_json = json.dumps(file_info)
+            item.lease_owner = None
+            item.lease_expires_at = None
+
+    if new_rows:
+        _insert_ignore_duplicates(new_rows)
+    db.session.commit()
+
+    return BackupWorkItem.query.filter(
+        BackupWorkItem.identifier == identifier,
+        BackupWorkItem.status.in_(['pending', 'claimed'])
+    ).count()
+
+
+def claim_work(claim_token: str, identifier: Optional[str] = None, limit: int = 8,
+               lease_seconds: int = 300) -> List[BackupWorkItem]:
+    """Claim up to limit claimable rows for this worker and commit the claim.
+
+    On PostgreSQL candidates are picked with FOR UPDATE SKIP LOCKED, so workers
+    on different hosts never block on or share each other's rows. SQLite ignores
+    the locking clause and serialises writers instead; the conditional UPDATE
+    below only takes rows that are still claimable, so the claim holds there too.
+    """
+    # Under SQLite another worker can win every candidate between our SELECT and
+    # UPDATE; look again a few times before reporting the queue as drained
+    for _ in range(3):
+        now = datetime.utcnow()
+
+        candidates = select(BackupWorkItem.id).where(_claimable(now))
+        if identifier:
+            candidates = candidates.where(BackupWorkItem.identifier == identifier)
+        candidates = candidates.order_by(BackupWorkItem.id).limit(limit).with_for_update(skip_locked=True)
+
+        ids = db.session.execute(candidates).scalars().all()
+        if not ids:
+            db.session.commit()
+            return []
+
+        db.session.execute(
+            update(BackupWorkItem)
+            .where(BackupWorkItem.id.in_(ids), _claimable(now))
+            .values(status='claimed',
+                    lease_owner=claim_token,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    heartbeat_at=now,
+                    attempts=BackupWorkItem.attempts + 1,
+                    updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        claimed = BackupWorkItem.query.filter(
+            BackupWorkItem.id.in_(ids),
+            BackupWorkItem.status == 'claimed',
+            BackupWorkItem.lease_owner == claim_token
+        ).order_by(BackupWorkItem.id).all()
+        if claimed:
+            return claimed
+
+    return []
+
+
+def heartbeat(claim_token: str, lease_seconds: int = 300, connection=None) -> int:
+    """Extend the lease on every row this worker holds; returns rows extended"""
+    now = datetime.utcnow()
+    statement = (
+        update(BackupWorkItem.__table__)
+        .where(BackupWorkItem.__table__.c.lease_owner == claim_token,
+               BackupWorkItem.__table__.c.status == 'claimed')
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+    )
+    if connection is not None:
+        return connection.execute(statement).rowcount
+    return db.session.execute(statement).rowcount
+
+
+def complete_work(claim_token: str, identifier: str, done_names: Iterable[str] = (),
+                  failed: Optional[Dict[str, str]] = None):
+    """Release this worker's claims: finished files become done, failures failed"""
+    now = datetime.utcnow()
+    table = BackupWorkItem.__table__
+    held = and_(table.c.identifier == identifier, table.c.lease_owner == claim_token,
+                table.c.status == 'claimed')
+
+    done_names = list(done_names)
+    if done_names:
+        db.session.execute(
+            update(table).where(held, table.c.file_name.in_(done_names))
+            .values(status='done', lease_owner=None, lease_expires_at=None, last_error=None, updated_at=now)
+        )
+    for name, error in (failed or {}).items():
+        db.session.execute(
+            update(table).where(held, table.c.file_name == name)
+            .values(status='failed', lease_owner=None, lease_expires_at=None, last_error=error, updated_at=now)
+        )
+
+
+class LeaseKeeper:
+    """Background heartbeat that keeps a worker's leases alive during long downloads.
+
+    Runs on its own engine connection so the request/task session is never
+    touched from another thread.
+    """
+
+    def __init__(self, app, claim_token: str, lease_seconds: int = 300):
+        self.app = app
+        self.claim_token = claim_token
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+
+    def __enter__(self) -> 'LeaseKeeper':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        interval = max(self.lease_seconds / 3, 1)
+        while not self._stop.wait(interval):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        heartbeat(self.claim_token, self.lease_seconds, connection=connection)
+            except Exception as e:
+                print(f"[WorkQueue] Heartbeat failed for {self.claim_token}: {str(e)}")
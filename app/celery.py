@@ -0,0 +1,11 @@
+"""
+Celery worker entry point
+
+    celery -A app.celery worker --loglevel=info
+"""
+
+import os
+from app import create_app
+
+flask_app = create_app(os.getenv('FLASK_CONFIG') or 'default')
+celery = flask_app.extensions['celery']
@@ -0,0 +1,46 @@
+import click
+from app.models.show_metadata import db, ArchiveItem
+
+def register_commands(app):
+    """Attach maintenance commands to the flask CLI"""
+    app.cli.add_command(backfill_show_columns)
+    app.cli.add_command(rebuild_search_index)
+    app.cli.add_command(rebuild_stats_rollup)
+
+@click.command('backfill-show-columns')
+@click.option('--batch-size', default=500, show_default=True, help='Items per commit')
+def backfill_show_columns(batch_size):
+    """Fill the indexed show columns of existing items from their metadata JSON"""
+    updated = 0
+    last_id = 0
+    while True:
+        items = ArchiveItem.query.filter(ArchiveItem.id > last_id).order_by(ArchiveItem.id).limit(batch_size).all()
+        if not items:
+            break
+        
+        for item in items:
+            item.refresh_show_columns()
+        last_id = items[-1].id
+        updated += len(items)
+        db.session.commit()
+    
+    print(f"Backfilled show columns for {updated} items")
+
+@click.command('rebuild-search-index')
+@click.option('--batch-size', default=500, show_default=True, help='Items per commit')
+def rebuild_search_index(batch_size):
+    """Re-index every item's title, venue, notes and reviews for full-text search"""
+    from app.api.fulltext import rebuild_index
+    
+    indexed = rebuild_index(batch_size=batch_size)
+    print(f"Indexed {indexed} items for full-text search")
+
+
+@click.command('rebuild-stats-rollup')
+@click.option('--batch-size', default=500, show_default=True, help='Items read per query')
+def rebuild_stats_rollup(batch_size):
+    """Recompute the per-year, creator and collection totals behind the stats pages"""
+    from app.api.rollup import rebuild_rollup
+    
+    counted = rebuild_rollup(batch_size=batch_size)
+    print(f"Rebuilt stats rollup from {counted} items")
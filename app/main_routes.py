@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response
-from app.models.show_metadata import ArchiveItem, db
-from app.api.archive_api import ArchiveAPI
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, send_file
+from app.models.show_metadata import ArchiveItem, ArchiveFile, db
+from app.api.archive_api import get_archive_api
+from app.api.rollup import library_totals, stats_summary
+from app.api.ttl_cache import TTLCache
+from app.api.backup_routes import find_item_file
+from app.api.show_archive import ArchiveMember, TarStream, ZipStream, archive_etag
 from sqlalchemy import desc
-from datetime import datetime
+from urllib.parse import quote
+from werkzeug.exceptions import HTTPException, RequestedRangeNotSatisfiable
 import os
 
 main_bp = Blueprint('main', __name__)
@@ -14,9 +19,10 @@ def index():
         # Get recent backups
         recent_backups = ArchiveItem.query.order_by(desc(ArchiveItem.created_at)).limit(10).all()
         
-        # Get basic stats
-        total_items = ArchiveItem.query.count()
-        fully_backed_up = ArchiveItem.query.filter_by(is_backed_up=True).count()
+        # Get basic stats from the rollup table
+        totals = library_totals()
+        total_items = totals['item_count']
+        fully_backed_up = totals['backed_up_count']
         
         return render_template('index.html',
                              recent_backups=recent_backups,
@@ -45,12 +51,12 @@ def show_detail(identifier):
     try:
         item = ArchiveItem.query.filter_by(identifier=identifier).first_or_404()
         
-        # Count downloaded files
-        downloaded_files = [f for f in item.files if f.is_downloaded]
-        total_files = len(item.files)
+        # Count downloaded files in SQL; the file table below loads the rows once
+        from app.api.backup_routes import file_counts_by_item
+        total_files, downloaded_files = file_counts_by_item([item.id]).get(item.id, (0, 0))
         
         # Calculate progress percentage
-        progress_percent = (len(downloaded_files) / total_files * 100) if total_files > 0 else 0
+        progress_percent = (downloaded_files / total_files * 100) if total_files > 0 else 0
         
         return render_template('show_detail.html',
                              item=item,
@@ -67,42 +73,49 @@ def browse():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = 20
+        cursor = request.args.get('cursor')
         
         # Get search parameters
         search_term = request.args.get('search_term', '')
         creator = request.args.get('creator', '')
         year = request.args.get('year', '')
+        venue = request.args.get('venue', '')
+        filters = {'creator': creator, 'year': int(year) if year.isdigit() else None, 'venue': venue}
+        
+        # Build query on the indexed show columns
+        from app.api.facets import filtered_items, facet_counts
+        from app.api.pagination import order_by_keys, keyset_paginate
+        query, sort_keys = filtered_items(search_term, filters)
+        
+        # ?cursor= pages by keyset (no OFFSET, no COUNT); otherwise numbered pages
+        pagination = None
+        next_cursor = None
+        if cursor is not None:
+            keyset_page = keyset_paginate(query, sort_keys, cursor=cursor, per_page=per_page)
+            items = keyset_page['items']
+            next_cursor = keyset_page['next_cursor']
+        else:
+            pagination = order_by_keys(query, sort_keys).paginate(page=page, per_page=per_page, error_out=False)
+            items = pagination.items
         
-        # Build query
-        query = ArchiveItem.query
-        
-        if search_term:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{search_term}%'))
-        
-        if creator:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%{creator}%'))
-        
-        if year:
-            query = query.filter(ArchiveItem.item_metadata.like(f'%"year":"{year}%'))
-        
-        # Order by created_at descending
-        query = query.order_by(desc(ArchiveItem.created_at))
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        # Get unique creators and years (simplified - would need JSON extraction for production)
-        creators = []
-        years = []
+        # Filter options with counts for the items the other filters leave
+        facets = facet_counts(search_term, filters)
+        creators = facets['creator']
+        years = [(str(show_year), count) for show_year, count in facets['year']]
+        venues = facets['venue']
         
         return render_template('browse.html',
-                             items=pagination.items,
+                             items=items,
                              pagination=pagination,
+                             cursor=cursor,
+                             next_cursor=next_cursor,
                              creators=creators,
                              years=years,
+                             venues=venues,
                              search_term=search_term,
                              selected_creator=creator,
-                             selected_year=year)
+                             selected_year=year,
+                             selected_venue=venue)
     except Exception as e:
         flash(f'Error browsing shows: {str(e)}', 'error')
         return render_template('browse.html',
@@ -110,21 +123,22 @@ def browse():
                              pagination=None,
                              creators=[],
                              years=[],
+                             venues=[],
                              search_term='',
                              selected_creator='',
-                             selected_year='')
+                             selected_year='',
+                             selected_venue='')
 
 @main_bp.route('/stats')
 def stats():
     """Statistics page"""
     try:
-        # Basic stats
-        total_items = ArchiveItem.query.count()
-        fully_backed_up = ArchiveItem.query.filter_by(is_backed_up=True).count()
-        
-        # Simplified stats (JSON querying would be database-specific)
-        year_stats = []
-        creator_stats = []
+        # Totals and breakdowns from the rollup table
+        summary = stats_summary()
+        total_items = summary['total_items']
+        fully_backed_up = summary['fully_backed_up']
+        year_stats = summary['year_stats']
+        creator_stats = summary['creator_stats']
         
         # Recent backups
         recent_backups = ArchiveItem.query.filter(
@@ -136,6 +150,8 @@ def stats():
                              fully_backed_up=fully_backed_up,
                              year_stats=year_stats,
                              creator_stats=creator_stats,
+                             collection_stats=summary['collection_stats'],
+                             file_stats=summary['file_stats'],
                              recent_backups=recent_backups)
     except Exception as e:
         flash(f'Error loading statistics: {str(e)}', 'error')
@@ -144,6 +160,8 @@ def stats():
                              fully_backed_up=0,
                              year_stats=[],
                              creator_stats=[],
+                             collection_stats=[],
+                             file_stats={},
                              recent_backups=[])
 
 @main_bp.route('/api/quick_backup', methods=['POST'])
@@ -156,11 +174,11 @@ def quick_backup():
         if not identifier:
             return jsonify({'error': 'Identifier is required'}), 400
         
-        # Initialize Archive API
-        archive_api = ArchiveAPI()
+        # Shared Archive API client (pooled per worker)
+        archive_api = get_archive_api()
         
-        # Get metadata
-        metadata_response = archive_api.get_metadata(identifier)
+        # Get current metadata (not a cached copy)
+        metadata_response = archive_api.get_metadata(identifier, refresh=True)
         if not metadata_response:
             return jsonify({'error': 'Failed to fetch metadata from Archive.org'}), 404
         
@@ -169,10 +187,9 @@ def quick_backup():
         if existing:
             return jsonify({'error': 'Archive item already backed up', 'identifier': identifier}), 409
         
-        # Create metadata
-        from app.api.backup_routes import create_metadata_from_response
-        archive_item = create_metadata_from_response(metadata_response)
-        db.session.add(archive_item)
+        # Create metadata and its file rows
+        from app.api.backup_routes import save_item_metadata
+        archive_item, _ = save_item_metadata(identifier, metadata_response)
         db.session.commit()
         
         return jsonify({
@@ -194,7 +211,8 @@ def get_metadata(identifier):
         
         if local_item:
             # Return local metadata in the same format as Archive.org API
-            metadata_dict = local_item.metadata_dict or {}
+            # Copy: metadata_dict is the item's shared parsed cache
+            metadata_dict = dict(local_item.metadata_dict or {})
             
             # Add stats data to metadata if available
             if local_item.stats:
@@ -227,7 +245,7 @@ def get_metadata(identifier):
             return jsonify(local_metadata)
         
         # If not found locally, fetch from Archive.org
-        archive_api = ArchiveAPI()
+        archive_api = get_archive_api()
         metadata_response = archive_api.get_metadata(identifier)
         if not metadata_response:
             return jsonify({'error': 'Failed to fetch metadata from Archive.org'}), 404
@@ -257,79 +275,27 @@ def get_metadata(identifier):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main_bp.route('/api/cache/stats')
+def cache_stats():
+    """Archive.org response cache counters for the worker serving the request"""
+    try:
+        return jsonify(get_archive_api().cache_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @main_bp.route('/api/update_ratings', methods=['POST'])
 def update_all_ratings():
-    """Update rating, stats, and review information for all existing backed-up shows"""
+    """Queue a refresh of rating, stats and review information for all backed-up shows"""
     try:
-        from app.models.show_metadata import ArchiveItemStats, ArchiveItemReview
-        
-        archive_api = ArchiveAPI()
-        items = ArchiveItem.query.all()
-        updated_count = 0
-        reviews_updated = 0
-        
-        for item in items:
-            try:
-                # Fetch fresh metadata to get current reviews
-                metadata_response = archive_api.get_metadata(item.identifier)
-                if metadata_response and metadata_response.get('metadata'):
-                    # Update reviews from metadata API
-                    reviews_data = metadata_response['metadata'].get('reviews', [])
-                    
-                    # Clear existing reviews
-                    ArchiveItemReview.query.filter_by(archive_item_id=item.id).delete()
-                    
-                    # Add current reviews
-                    for review_data in reviews_data:
-                        review = ArchiveItemReview(
-                            archive_item_id=item.id,
-                            reviewbody=review_data.get('reviewbody'),
-                            reviewtitle=review_data.get('reviewtitle'),
-                            reviewer=review_data.get('reviewer'),
-                            reviewdate=review_data.get('reviewdate'),
-                            createdate=review_data.get('createdate'),
-                            stars=review_data.get('stars'),
-                            reviewer_itemname=review_data.get('reviewer_itemname')
-                        )
-                        db.session.add(review)
-                        reviews_updated += 1
-                
-                # Fetch stats data from search API
-                search_url = f"{archive_api.base_url}services/search/v1/scrape?fields=avg_rating,num_reviews,stars,downloads,week,month&q=identifier:{item.identifier}"
-                search_results = archive_api.get_search_results(search_url)
-                if search_results and search_results.get('items'):
-                    search_data = search_results['items'][0]
-                    
-                    # Get or create stats record
-                    stats = ArchiveItemStats.query.filter_by(archive_item_id=item.id).first()
-                    if not stats:
-                        stats = ArchiveItemStats(archive_item_id=item.id)
-                        db.session.add(stats)
-                    
-                    # Update with search API data
-                    stats.avg_rating = search_data.get('avg_rating')
-                    stats.num_reviews = search_data.get('num_reviews')
-                    stats.stars_list = search_data.get('stars', [])
-                    stats.downloads = search_data.get('downloads')
-                    stats.downloads_week = search_data.get('week')
-                    stats.downloads_month = search_data.get('month')
-                    stats.last_updated = datetime.utcnow()
-                    
-                    updated_count += 1
-                    print(f"Updated stats for {item.identifier}: {search_data.get('avg_rating')} stars, {search_data.get('downloads')} downloads")
-                    
-            except Exception as e:
-                print(f"Failed to update stats for {item.identifier}: {str(e)}")
-                continue
+        from app.api.backup_routes import enqueue_backup_job
         
-        db.session.commit()
+        job = enqueue_backup_job('*', 'ratings')
         
         return jsonify({
-            'message': f'Updated stats and reviews for {updated_count} shows',
-            'updated_count': updated_count,
-            'reviews_updated': reviews_updated,
-            'total_items': len(items)
-        })
+            'message': 'Ratings refresh queued',
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
@@ -343,7 +309,7 @@ def health_check():
         db.session.execute('SELECT 1')
         
         # Check Archive.org connection
-        archive_api = ArchiveAPI()
+        archive_api = get_archive_api()
         test_url = archive_api.metadata_url('test')
         
         return jsonify({
@@ -358,47 +324,52 @@ def health_check():
             'error': str(e)
         }), 500 
 
+def get_play_path_cache() -> TTLCache:
+    """Return the process-wide (identifier, filename) -> (disk path, local_path) cache for /play"""
+    cache = current_app.extensions.get('play_path_cache')
+    if cache is None:
+        cache = TTLCache(ttl=current_app.config.get('PLAY_PATH_CACHE_SECONDS', 300),
+                         max_entries=current_app.config.get('PLAY_PATH_CACHE_SIZE', 1024))
+        current_app.extensions['play_path_cache'] = cache
+    return cache
+
+def resolve_local_path(local_path):
+    """Disk path of a downloaded file's local_path"""
+    # Downloads record 'storage/files/...' relative to the working directory;
+    # anything else is relative to FILES_STORAGE_PATH
+    if local_path.startswith('storage/files/'):
+        return local_path
+    return os.path.join(current_app.config.get('FILES_STORAGE_PATH', 'storage/files'), local_path)
+
 @main_bp.route('/play/<identifier>/<path:filename>')
 def play_file(identifier, filename):
     """Serve audio files for playback"""
     try:
-        # Security: Verify the file belongs to a backed up show
-        item = ArchiveItem.query.filter_by(identifier=identifier).first_or_404()
-        
-        # Find the specific file
-        file_record = None
-        for file_obj in item.files:
-            if file_obj.name == filename:
-                file_record = file_obj
-                break
-        
-        if not file_record:
-            return jsonify({'error': f'File {filename} not found in database'}), 404
-        
-        # Check if file is downloaded and has local path
-        if not file_record.is_downloaded:
-            return jsonify({'error': f'File {filename} not downloaded yet'}), 404
-        
-        if not file_record.local_path:
-            return jsonify({'error': f'File {filename} has no local path'}), 404
-        
-        # Get the full path
-        files_storage_path = current_app.config.get('FILES_STORAGE_PATH', 'storage/files')
-        
-        if file_record.local_path:
-            # Check if local_path already contains the storage path prefix
-            if file_record.local_path.startswith('storage/files/'):
-                # local_path already contains the storage path, use it directly
-                file_path = file_record.local_path
-            else:
-                # local_path is relative to FILES_STORAGE_PATH
-                file_path = os.path.join(files_storage_path, file_record.local_path)
+        # Hot tracks skip the database; entries expire, and a file gone from disk is looked up again
+        path_cache = get_play_path_cache()
+        cached = path_cache.get((identifier, filename))
+        if cached is not None and os.path.exists(cached[0]):
+            file_path, local_path = cached
         else:
-            # Fallback: construct path based on identifier and filename
-            file_path = os.path.join(files_storage_path, identifier, filename)
-        
-        if not os.path.exists(file_path):
-            return jsonify({'error': f'File not found on disk: {file_path}'}), 404
+            # Security: the file must belong to a backed up show (one indexed lookup)
+            file_record = find_item_file(identifier, filename)
+            if not file_record:
+                return jsonify({'error': f'File {filename} not found in database'}), 404
+            
+            # Check if file is downloaded and has local path
+            if not file_record.is_downloaded:
+                return jsonify({'error': f'File {filename} not downloaded yet'}), 404
+            
+            if not file_record.local_path:
+                return jsonify({'error': f'File {filename} has no local path'}), 404
+            
+            local_path = file_record.local_path
+            file_path = resolve_local_path(local_path)
+            if not os.path.exists(file_path):
+                path_cache.delete((identifier, filename))
+                return jsonify({'error': f'File not found on disk: {file_path}'}), 404
+            
+            path_cache.set((identifier, filename), (file_path, local_path))
         
         # Determine content type
         content_type = 'audio/mpeg'  # Default
@@ -411,21 +382,96 @@ def play_file(identifier, filename):
         elif filename.lower().endswith('.wav'):
             content_type = 'audio/wav'
         
-        # Support range requests for seeking
-        def generate():
-            with open(file_path, 'rb') as f:
-                while True:
-                    data = f.read(8192)  # 8KB chunks
-                    if not data:
-                        break
-                    yield data
-        
-        response = Response(generate(), mimetype=content_type)
+        # Let nginx serve the bytes from its internal location (which maps to the files storage)
+        accel_prefix = current_app.config.get('PLAY_X_ACCEL_REDIRECT')
+        if accel_prefix:
+            relative_path = os.path.normpath(local_path)
+            if relative_path.startswith('storage/files/'):
+                relative_path = relative_path[len('storage/files/'):]
+            if not relative_path.startswith(('..', '/')):
+                response = Response(mimetype=content_type)
+                response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(relative_path)
+                response.headers['Cache-Control'] = 'public, max-age=3600'
+                return response
+        
+        # Range requests answer 206, and If-None-Match / If-Modified-Since 304; the body goes
+        # out through wsgi.file_wrapper, which gunicorn sends with sendfile()
+        response = send_file(os.path.abspath(file_path), mimetype=content_type, conditional=True,
+                             etag=True, max_age=3600)
         response.headers['Accept-Ranges'] = 'bytes'
-        response.headers['Content-Length'] = str(os.path.getsize(file_path))
-        response.headers['Cache-Control'] = 'public, max-age=3600'
-        
         return response
         
+    except HTTPException:
+        # e.g. 416 for an unsatisfiable range
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500 
+
+def show_archive_members(identifier):
+    """ArchiveMembers for a show's downloaded files in name order, or None if the show is unknown"""
+    item_id = db.session.query(ArchiveItem.id).filter_by(identifier=identifier).scalar()
+    if item_id is None:
+        return None
+    
+    members = []
+    for name, local_path in db.session.query(ArchiveFile.name, ArchiveFile.local_path).filter(
+            ArchiveFile.archive_item_id == item_id, ArchiveFile.is_downloaded.is_(True),
+            ArchiveFile.local_path.isnot(None)).order_by(ArchiveFile.name):
+        file_path = resolve_local_path(local_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            print(f"[DEBUG] Skipping {identifier}/{name} in archive: not on disk at {file_path}")
+            continue
+        members.append(ArchiveMember(f"{identifier}/{name}", file_path, stat.st_size, stat.st_mtime))
+    return members
+
+@main_bp.route('/download/<identifier>.<any(zip, tar):archive_format>')
+def download_show(identifier, archive_format):
+    """Stream every downloaded file of a show as one uncompressed zip or tar.
+
+    The archive is generated while it is sent (constant memory, no temporary
+    file) and its exact length is announced up front. The tar also answers
+    single-range requests, so interrupted downloads can resume.
+    """
+    try:
+        members = show_archive_members(identifier)
+        if members is None:
+            return jsonify({'error': f'Show {identifier} not found'}), 404
+        if not members:
+            return jsonify({'error': f'No downloaded files for {identifier}'}), 404
+        
+        stream = TarStream(members) if archive_format == 'tar' else ZipStream(members)
+        etag = archive_etag(identifier, archive_format, members)
+        headers = {
+            'Content-Disposition': f'attachment; filename="{identifier}.{archive_format}"',
+            'Accept-Ranges': 'bytes' if archive_format == 'tar' else 'none',
+            'ETag': f'"{etag}"'
+        }
+        mimetype = 'application/x-tar' if archive_format == 'tar' else 'application/zip'
+        
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        
+        # A single range of the tar, unless If-Range names an older version of the show.
+        # No Last-Modified is sent, so a date in If-Range can't be checked and gets the full archive.
+        byte_range = request.range
+        if_range = request.if_range
+        if (archive_format == 'tar' and byte_range is not None and len(byte_range.ranges) == 1
+                and if_range.date is None and (if_range.etag is None or if_range.etag == etag)):
+            span = byte_range.range_for_length(stream.length)
+            if span is None:
+                raise RequestedRangeNotSatisfiable(length=stream.length)
+            start, stop = span
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{stream.length}'
+            headers['Content-Length'] = str(stop - start)
+            return Response(stream.iter_range(start, stop), status=206, mimetype=mimetype, headers=headers)
+        
+        headers['Content-Length'] = str(stream.length)
+        body = stream.iter_range() if archive_format == 'tar' else iter(stream)
+        return Response(body, mimetype=mimetype, headers=headers)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,16 +1,54 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, BigInteger, UniqueConstraint, Index, JSON, event, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import json
 
-db = SQLAlchemy()
+# orjson parses the metadata blobs several times faster; fall back to json without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(text):
+    """Parse JSON with orjson when installed (its errors subclass json.JSONDecodeError)"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def json_dumps(value) -> str:
+    """Serialize JSON with orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+# The engine (de)serializes JSON columns with the faster backend too
+db = SQLAlchemy(engine_options={'json_serializer': json_dumps, 'json_deserializer': json_loads})
+
+# JSON documents: JSONB on PostgreSQL, JSON (text queried through JSON1) on SQLite
+JSONType = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+# Indexes on metadata paths, per dialect; migration 009 creates the same ones
+METADATA_INDEX_DDL = {
+    'postgresql': [
+        "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_gin ON archive_items USING GIN (item_metadata jsonb_path_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_date ON archive_items ((item_metadata ->> 'date'))"
+    ],
+    'sqlite': [
+        "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_date ON archive_items (json_extract(item_metadata, '$.date'))"
+    ]
+}
 
 class ArchiveItem(db.Model):
     """Complete Archive.org item model - direct replication of API response"""
     __tablename__ = 'archive_items'
+    __table_args__ = (
+        # Keyset pagination seeks on (created_at, id), newest first
+        Index('ix_archive_items_created_at_id', 'created_at', 'id'),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True)
@@ -26,16 +64,28 @@ class ArchiveItem(db.Model):
     item_size = Column(BigInteger)  # Total size in bytes
     server = Column(String(255))  # Server hosting the item
     uniq = Column(BigInteger)  # Unique identifier
-    workable_servers = Column(Text)  # JSON array of available servers
+    workable_servers = Column(JSONType)  # Array of available servers
+    
+    # HTTP validators of the last metadata response, for conditional refreshes
+    metadata_etag = Column(String(255))
+    metadata_last_modified = Column(String(64))
     
     # Full metadata as JSON (direct replication)
-    item_metadata = Column(Text)  # Complete metadata JSON
+    item_metadata = Column(JSONType)  # Complete metadata document
+    
+    # Show fields copied out of item_metadata so filters can use B-tree indexes
+    show_title = Column(String(500), index=True)
+    show_date = Column(String(50), index=True)  # "YYYY-MM-DD" as published
+    show_year = Column(Integer, index=True)
+    show_venue = Column(String(500), index=True)
+    show_creator = Column(String(255), index=True)
+    show_collection = Column(String(255), index=True)  # Primary (first) collection
     
     # Backup specific fields
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_backed_up = Column(Boolean, default=False)
-    backup_date = Column(DateTime)
+    backup_date = Column(DateTime, index=True)
     
     # Relationships
     files = relationship("ArchiveFile", back_populates="archive_item", cascade="all, delete-orphan")
@@ -50,39 +100,58 @@ class ArchiveItem(db.Model):
     
     @property
     def metadata_dict(self) -> Optional[Dict[str, Any]]:
-        """Get metadata as dictionary"""
-        if self.item_metadata:
-            try:
-                return json.loads(self.item_metadata)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        """Get metadata as dictionary.
+
+        The JSON column is parsed once when the row loads and shared by title,
+        venue, date and the other accessors; treat it as read-only and assign
+        a new dict to change it.
+        """
+        metadata = self.item_metadata
+        return metadata if isinstance(metadata, dict) else {}
     
     @metadata_dict.setter
     def metadata_dict(self, value: Optional[Dict[str, Any]]):
         """Set metadata from dictionary"""
-        if value:
-            self.item_metadata = json.dumps(value)
-        else:
-            self.item_metadata = None
+        self.item_metadata = dict(value) if value else None
+        self.refresh_show_columns(value or {})
+    
+    def refresh_show_columns(self, metadata: Optional[Dict[str, Any]] = None):
+        """Copy title, date, year, venue, creator and collection from metadata into the indexed columns"""
+        if metadata is None:
+            metadata = self.metadata_dict
+        
+        def first(value, length):
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if value is None or value == '':
+                return None
+            return str(value).strip()[:length]
+        
+        self.show_title = first(metadata.get('title'), 500)
+        self.show_venue = first(metadata.get('venue'), 500)
+        self.show_creator = first(metadata.get('creator'), 255)
+        self.show_collection = first(metadata.get('collection'), 255)
+        
+        date = first(metadata.get('date'), 50)
+        self.show_date = date[:10] if date else None
+        
+        # Archive.org publishes year separately; fall back to the date's prefix
+        year = first(metadata.get('year'), 50) or (date[:4] if date else None)
+        try:
+            self.show_year = int(year) if year else None
+        except ValueError:
+            self.show_year = None
     
     @property
     def workable_servers_list(self) -> Optional[List[str]]:
         """Get workable servers as list"""
-        if self.workable_servers:
-            try:
-                return json.loads(self.workable_servers)
-            except json.JSONDecodeError:
-                return []
-        return []
+        servers = self.workable_servers
+        return list(servers) if isinstance(servers, list) else []
     
     @workable_servers_list.setter
     def workable_servers_list(self, value: Optional[List[str]]):
         """Set workable servers from list"""
-        if value:
-            self.workable_servers = json.dumps(value)
-        else:
-            self.workable_servers = None
+        self.workable_servers = list(value) if value else None
     
     # Convenience properties for common metadata fields
     @property
@@ -144,9 +213,9 @@ class ArchiveItem(db.Model):
         """Get download count from stats table (search API data)"""
         return self.stats.downloads if self.stats else None
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for JSON serialization (Archive.org format)"""
-        return {
+    def to_dict(self, include_files: bool = True) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization (Archive.org format); include_files=False skips loading the file rows"""
+        result = {
             'identifier': self.identifier,
             'created': self.created,
             'd1': self.d1,
@@ -159,17 +228,31 @@ class ArchiveItem(db.Model):
             'server': self.server,
             'uniq': self.uniq,
             'workable_servers': self.workable_servers_list,
-            'files': [file.to_dict() for file in self.files],
             # Backup fields
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_backed_up': self.is_backed_up,
             'backup_date': self.backup_date.isoformat() if self.backup_date else None
         }
+        if include_files:
+            result['files'] = [file.to_dict() for file in self.files]
+        return result
+
+@event.listens_for(ArchiveItem.__table__, 'after_create')
+def _create_metadata_indexes(target, connection, **kwargs):
+    # db.create_all() gets the same expression indexes migrations build
+    for statement in METADATA_INDEX_DDL.get(connection.dialect.name, []):
+        connection.execute(text(statement))
 
 class ArchiveFile(db.Model):
     """Complete Archive.org file model - direct replication of files array"""
     __tablename__ = 'archive_files'
+    __table_args__ = (
+        # Per-item file counts (total and downloaded) read from the index alone
+        Index('ix_archive_files_item_downloaded', 'archive_item_id', 'is_downloaded'),
+        # One row per file name in an item; also the index for lookups by name
+        Index('uq_archive_files_item_name', 'archive_item_id', 'name', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     archive_item_id = Column(Integer, ForeignKey('archive_items.id'), nullable=False)
@@ -262,7 +345,7 @@ class ArchiveItemStats(db.Model):
     # Rating/Review data from search API
     avg_rating = Column(Float)  # Average star rating (0.0 - 5.0)
     num_reviews = Column(Integer)  # Number of reviews
-    stars_json = Column(Text)  # JSON array of individual star ratings [5,4,3,etc]
+    stars_json = Column(JSONType)  # Array of individual star ratings [5,4,3,etc]
     
     # Usage statistics from search API
     downloads = Column(Integer)  # Total download count
@@ -278,20 +361,13 @@ class ArchiveItemStats(db.Model):
     @property
     def stars_list(self) -> Optional[List[int]]:
         """Get individual star ratings as list"""
-        if self.stars_json:
-            try:
-                return json.loads(self.stars_json)
-            except json.JSONDecodeError:
-                return []
-        return []
+        stars = self.stars_json
+        return list(stars) if isinstance(stars, list) else []
     
     @stars_list.setter
     def stars_list(self, value: Optional[List[int]]):
         """Set individual star ratings from list"""
-        if value:
-            self.stars_json = json.dumps(value)
-        else:
-            self.stars_json = None
+        self.stars_json = list(value) if value else None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -374,6 +450,33 @@ class BackupJob(db.Model):
     error_message = Column(Text)
     celery_task_id = Column(String(255))
     
+    # Progress reported by the worker running the job
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    current_step = Column(String(50))  # 'metadata', 'reviews', 'stats', 'files'
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0 across the files step
+    total_files = Column(Integer)
+    completed_files = Column(Integer, default=0)
+    failed_files = Column(Integer, default=0)
+    result_json = Column(Text)  # JSON summary of the finished job
+    
+    @property
+    def result_dict(self) -> Dict[str, Any]:
+        """Get job result summary as dictionary"""
+        if self.result_json:
+            try:
+                return json.loads(self.result_json)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+    
+    @result_dict.setter
+    def result_dict(self, value: Optional[Dict[str, Any]]):
+        """Set job result summary from dictionary"""
+        if value:
+            self.result_json = json.dumps(value)
+        else:
+            self.result_json = None
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
@@ -384,7 +487,104 @@ class BackupJob(db.Model):
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'error_message': self.error_message,
-            'celery_task_id': self.celery_task_id
+            'celery_task_id': self.celery_task_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'current_step': self.current_step,
+            'progress': self.progress,
+            'total_files': self.total_files,
+            'completed_files': self.completed_files,
+            'failed_files': self.failed_files,
+            'result': self.result_dict
+        }
+
+class BackupWorkItem(db.Model):
+    """One file to download, claimed by at most one worker at a time.
+
+    Rows are unique per (identifier, file_name), so concurrent jobs for the same
+    show share a single queue entry per file instead of downloading it twice.
+    """
+    __tablename__ = 'backup_work_items'
+    __table_args__ = (
+        UniqueConstraint('identifier', 'file_name', name='uq_backup_work_items_identifier_file'),
+        Index('ix_backup_work_items_claim', 'identifier', 'status', 'lease_expires_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey('backup_jobs.id'))  # Job that last queued the file
+    identifier = Column(String(255), nullable=False)
+    file_name = Column(String(500), nullable=False)
+    file_info_json = Column(Text)  # Archive.org file info (size, checksums) for the download
+    
+    # Claim state: 'pending', 'claimed', 'done', 'failed'
+    status = Column(String(20), nullable=False, default='pending')
+    lease_owner = Column(String(255))  # Claim token of the worker holding the lease
+    lease_expires_at = Column(DateTime)  # Claimed rows past this time are up for grabs again
+    heartbeat_at = Column(DateTime)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def file_info(self) -> Dict[str, Any]:
+        """Get Archive.org file info as dictionary"""
+        if self.file_info_json:
+            try:
+                return json.loads(self.file_info_json)
+            except json.JSONDecodeError:
+                return {'name': self.file_name}
+        return {'name': self.file_name}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'identifier': self.identifier,
+            'file_name': self.file_name,
+            'status': self.status,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'attempts': self.attempts,
+            'last_error': self.last_error
+        }
+
+class StatsRollup(db.Model):
+    """Running totals of items, files and bytes per year, creator and collection.
+
+    Kept current by the backup code as items change (see app/api/rollup.py) so
+    the stats pages read a few rows instead of scanning archive_items and
+    archive_files. The ('all', '') row holds the library-wide totals.
+    """
+    __tablename__ = 'stats_rollup'
+    __table_args__ = (
+        UniqueConstraint('dimension', 'key', name='uq_stats_rollup_dimension_key'),
+        # Top creators/collections by item count
+        Index('ix_stats_rollup_dimension_items', 'dimension', 'item_count'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    dimension = Column(String(20), nullable=False)  # 'all', 'year', 'creator', 'collection'
+    key = Column(String(255), nullable=False)  # Year as text, creator or collection name
+    
+    item_count = Column(Integer, nullable=False, default=0)
+    backed_up_count = Column(Integer, nullable=False, default=0)  # Items with files backed up
+    file_count = Column(Integer, nullable=False, default=0)
+    downloaded_file_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    downloaded_bytes = Column(BigInteger, nullable=False, default=0)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'count': self.item_count,
+            'backed_up': self.backed_up_count,
+            'files': self.file_count,
+            'downloaded_files': self.downloaded_file_count,
+            'total_bytes': self.total_bytes,
+            'downloaded_bytes': self.downloaded_bytes
         }
 
 # Legacy aliases for backward compatibility
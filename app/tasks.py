@@ -0,0 +1,241 @@
+from celery import Celery, Task, chain, shared_task
+from datetime import datetime
+import functools
+from flask import current_app
+from app.models.show_metadata import db, ArchiveItem, ArchiveFile, BackupJob, BackupWorkItem
+from app.api.archive_api import get_archive_api
+from app.api.work_queue import new_claim_token, enqueue_files, claim_work, complete_work, LeaseKeeper
+
+def celery_init_app(app) -> Celery:
+    """Create the Celery app for a Flask app; every task runs inside an app context"""
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.import_name, task_cls=FlaskTask)
+    celery_app.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        # Eager mode runs the whole pipeline in-process (tests, local development)
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        task_eager_propagates=False,
+        task_ignore_result=True,
+        # Backups are long-running: take one at a time and only ack once finished
+        task_acks_late=True,
+        worker_prefetch_multiplier=1
+    )
+    celery_app.set_default()
+    app.extensions['celery'] = celery_app
+    return celery_app
+
+# Steps each job type runs, in order
+BACKUP_PIPELINES = {
+    'full': ['metadata', 'reviews', 'stats', 'files'],
+    'metadata': ['metadata', 'reviews', 'stats'],
+    'files': ['files'],
+    # Library-wide: the job's identifier is '*'
+    'ratings': ['ratings']
+}
+
+def start_backup_pipeline(job_id, job_type):
+    """Queue the task chain for a backup job; returns the AsyncResult of the chain"""
+    steps = [BACKUP_STEP_TASKS[step].si(job_id) for step in BACKUP_PIPELINES[job_type]]
+    pipeline = chain(*steps, finish_backup_job.si(job_id))
+    return pipeline.apply_async()
+
+def job_step(step):
+    """Decorator for pipeline steps taking a BackupJob.
+
+    Marks the job as running the step and commits the step's work. A failure is
+    recorded on the job row instead of raised, and later steps of a failed job are
+    skipped, so the chain winds down the same way on a worker and in eager mode.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(job_id):
+            job = db.session.get(BackupJob, job_id)
+            if job is None or job.status == 'failed':
+                return
+
+            job.status = 'running'
+            job.current_step = step
+            if not job.started_at:
+                job.started_at = datetime.utcnow()
+            db.session.commit()
+
+            try:
+                func(job)
+                db.session.commit()
+            except Exception as e:
+                print(f"[BackupJob {job_id}] {step} failed: {str(e)}")
+                db.session.rollback()
+                job = db.session.get(BackupJob, job_id)
+                job.status = 'failed'
+                job.error_message = str(e)
+                job.completed_at = datetime.utcnow()
+                db.session.commit()
+        return wrapper
+    return decorator
+
+def _merge_result(job, **values):
+    result = job.result_dict
+    result.update(values)
+    job.result_dict = result
+
+def _get_item(job):
+    archive_item = ArchiveItem.query.filter_by(identifier=job.identifier).first()
+    if not archive_item:
+        raise LookupError('Archive item not found. Please backup metadata first.')
+    return archive_item
+
+@shared_task
+@job_step('metadata')
+def backup_metadata_task(job):
+    """Fetch item metadata from Archive.org and store it (skipped when the item has not changed)"""
+    from app.api.backup_routes import refresh_item_metadata
+
+    archive_item, action, _ = refresh_item_metadata(get_archive_api(), job.identifier)
+    if action is None:
+        raise LookupError('Failed to fetch metadata from Archive.org')
+
+    _merge_result(job, action=action)
+
+@shared_task
+@job_step('reviews')
+def backup_reviews_task(job):
+    """Store reviews from the item's saved metadata"""
+    from app.api.backup_routes import create_reviews_from_metadata
+
+    archive_item = _get_item(job)
+    reviews = create_reviews_from_metadata(archive_item, {'metadata': archive_item.metadata_dict})
+    _merge_result(job, reviews_count=len(reviews))
+
+@shared_task
+@job_step('stats')
+def backup_stats_task(job):
+    """Fetch rating and download stats from the search API"""
+    from app.api.backup_routes import fetch_item_stats
+
+    archive_item = _get_item(job)
+    try:
+        fetch_item_stats(get_archive_api(), archive_item)
+    except Exception as e:
+        # Continue without stats - not critical
+        print(f"[BackupJob {job.id}] Could not fetch stats data: {str(e)}")
+        db.session.rollback()
+    _merge_result(job, has_stats=archive_item.stats is not None)
+
+@shared_task
+@job_step('files')
+def backup_files_task(job):
+    """Download the item's audio files through the shared claim queue.
+
+    Each file becomes a backup_work_items row. This worker claims batches of rows
+    under a lease (kept alive by a heartbeat) and downloads them, so several
+    workers, even on different hosts, can drain one show without fetching any
+    file twice. Progress is reported on the job row.
+    """
+    from app.api.backup_routes import audio_files_from_response, download_item_files
+
+    archive_item = _get_item(job)
+    config = current_app.config
+
+    # Usually served from the cache the metadata step just refreshed
+    metadata_response = get_archive_api().get_metadata(job.identifier)
+    if not metadata_response or 'files' not in metadata_response:
+        raise LookupError('Failed to fetch file list from Archive.org')
+
+    audio_files = audio_files_from_response(metadata_response)
+    already_downloaded = [
+        name for (name,) in db.session.query(ArchiveFile.name).filter_by(
+            archive_item_id=archive_item.id, is_downloaded=True)
+    ]
+    queued = enqueue_files(job.id, job.identifier, audio_files, done_names=already_downloaded)
+
+    job.total_files = len(audio_files)
+    job.completed_files = len(already_downloaded)
+    db.session.commit()
+
+    downloaded = []
+    failed = []
+    claim_token = new_claim_token()
+    lease_seconds = config.get('WORK_LEASE_SECONDS', 300)
+    print(f"[BackupJob {job.id}] {queued} files queued, claiming as {claim_token}")
+
+    with LeaseKeeper(current_app._get_current_object(), claim_token, lease_seconds):
+        while True:
+            claimed = claim_work(claim_token, job.identifier, limit=config.get('WORK_CLAIM_BATCH', 8),
+                                 lease_seconds=lease_seconds)
+            if not claimed:
+                break
+
+            def on_progress(item_progress):
+                # Called on this thread as each download finishes; commits the file rows too
+                job.completed_files = len(already_downloaded) + len(downloaded) + item_progress.completed_files
+                job.failed_files = len(failed) + item_progress.failed_files
+                job.progress = job.completed_files / job.total_files if job.total_files else 1.0
+                db.session.commit()
+
+            batch_downloaded, batch_failed, _ = download_item_files(
+                archive_item, [item.file_info for item in claimed], on_progress)
+            complete_work(claim_token, job.identifier, done_names=batch_downloaded,
+                          failed={name: 'Download failed' for name in batch_failed})
+            db.session.commit()
+
+            downloaded.extend(batch_downloaded)
+            failed.extend(batch_failed)
+
+    # Files still claimed here belong to another worker's live lease
+    in_progress_elsewhere = BackupWorkItem.query.filter_by(identifier=job.identifier, status='claimed').count()
+
+    job.completed_files = len(downloaded) + len(already_downloaded)
+    job.failed_files = len(failed)
+    _merge_result(job,
+                  downloaded_files=downloaded + already_downloaded,
+                  failed_files=failed,
+                  total_downloaded=len(downloaded) + len(already_downloaded),
+                  total_failed=len(failed),
+                  total_files=len(audio_files),
+                  in_progress_elsewhere=in_progress_elsewhere,
+                  storage_location=f'storage/files/{job.identifier}/')
+
+@shared_task
+@job_step('ratings')
+def refresh_ratings_task(job):
+    """Refresh ratings and download stats of every stored item in batched scrape queries"""
+    from app.api.backup_routes import refresh_all_stats
+
+    def on_progress(processed, total):
+        # Commits the batch's stats and reviews along with the progress
+        job.total_files = total
+        job.completed_files = processed
+        job.progress = processed / total if total else 1.0
+        db.session.commit()
+
+    summary = refresh_all_stats(get_archive_api(), batch_size=current_app.config.get('RATINGS_BATCH_SIZE', 100),
+                                progress_callback=on_progress)
+    job.failed_files = summary['failed']
+    _merge_result(job, **summary)
+
+@shared_task
+def finish_backup_job(job_id):
+    """Mark a job completed once every step of its pipeline has run"""
+    job = db.session.get(BackupJob, job_id)
+    if job is None or job.status == 'failed':
+        return
+
+    job.status = 'completed'
+    job.current_step = None
+    job.progress = 1.0
+    job.completed_at = datetime.utcnow()
+    _merge_result(job, message=f'{job.job_type.capitalize()} backup completed successfully')
+    db.session.commit()
+
+BACKUP_STEP_TASKS = {
+    'metadata': backup_metadata_task,
+    'reviews': backup_reviews_task,
+    'stats': backup_stats_task,
+    'files': backup_files_task,
+    'ratings': refresh_ratings_task
+}
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Download benchmark against a local stub of archive.org's /download endpoint
+
+Compares sequential downloads (one worker) with the concurrent DownloadManager
+pool for a show-sized batch of tracks. The stub adds per-request latency and
+throttles its transfer rate, which is where the real upstream spends its time.
+
+    python benchmarks/download_benchmark.py --files 30 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.api.archive_api import ArchiveAPI
+from app.api.download_manager import DownloadManager
+
+
+def make_handler(file_size, latency, chunk_delay):
+    payload = os.urandom(file_size)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            for offset in range(0, len(payload), 65536):
+                self.wfile.write(payload[offset:offset + 65536])
+                time.sleep(chunk_delay)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def run(workers, identifier, file_infos, base_url):
+    archive_api = ArchiveAPI(base_url=base_url, pool_maxsize=max(workers, 1))
+    manager = DownloadManager(archive_api, max_workers=workers, per_host_limit=workers)
+    start = time.time()
+    results = list(manager.download_all(identifier, file_infos))
+    duration = time.time() - start
+    manager.shutdown()
+    archive_api.close()
+    failed = len([path for _, path, _ in results if not path])
+    return duration, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=30, help='Tracks per show')
+    parser.add_argument('--size', type=int, default=512 * 1024, help='Bytes per track')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before the stub answers')
+    parser.add_argument('--chunk-delay', type=float, default=0.005, help='Seconds between 64 KB chunks')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent workers for the pooled run')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.size, args.latency, args.chunk_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    identifier = 'gd1977-05-08.benchmark'
+    file_infos = [{'name': f'gd77-05-08d1t{i:02d}.mp3', 'size': str(args.size)} for i in range(args.files)]
+
+    # download_file writes under ./storage/files, so keep the benchmark out of the real storage tree
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            sequential, sequential_failed = run(1, identifier, file_infos, base_url)
+            pooled, pooled_failed = run(args.workers, identifier, file_infos, base_url)
+        finally:
+            os.chdir(original_cwd)
+
+    server.shutdown()
+
+    print(f"Files: {args.files} x {args.size} bytes")
+    print(f"Sequential (1 worker):   {sequential:.2f}s ({sequential_failed} failed)")
+    print(f"Pooled ({args.workers} workers):     {pooled:.2f}s ({pooled_failed} failed)")
+    print(f"Speedup: {sequential / pooled:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
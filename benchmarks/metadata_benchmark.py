@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Metadata parsing benchmark for ArchiveItem accessors
+
+Serializes a page of search results the way search_local does (title, date,
+venue, creator, collection, description and the metadata dict per item).
+Compares parsing the metadata text on every accessor, as the model used to,
+with the JSON column that is parsed once when a row loads, and reports which
+JSON backend the engine uses.
+
+    python benchmarks/metadata_benchmark.py --items 20 --rounds 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.models import show_metadata
+from app.models.show_metadata import ArchiveItem
+
+
+def make_metadata(index, description_size):
+    """Metadata shaped like a Grateful Dead show, with a long description and reviews"""
+    return {
+        'identifier': f'gd1977-05-{index:02d}.sbd.benchmark',
+        'title': f'Grateful Dead Live at Barton Hall on 1977-05-{index:02d}',
+        'creator': 'Grateful Dead',
+        'date': f'1977-05-{index:02d}',
+        'year': '1977',
+        'venue': 'Barton Hall, Cornell University',
+        'coverage': 'Ithaca, NY',
+        'collection': ['GratefulDead', 'etree', 'stream_only'],
+        'description': 'Set 1: New Minglewood Blues, Loser, El Paso. ' * (description_size // 45),
+        'reviews': [{'reviewbody': 'Scarlet > Fire is transcendent. ' * 20, 'stars': '5'} for _ in range(15)]
+    }
+
+
+def uncached_summary(item, raw):
+    """The accessor pattern of the old Text column: one json.loads per field"""
+    def parsed():
+        return json.loads(raw) if raw else {}
+
+    title = parsed().get('title')
+    creator = parsed().get('creator')
+    return {
+        'title': title[0] if isinstance(title, list) else title,
+        'date': parsed().get('date'),
+        'venue': parsed().get('venue'),
+        'creator': creator[0] if isinstance(creator, list) else creator,
+        'collection': parsed().get('collection'),
+        'description': parsed().get('description'),
+        'metadata': parsed()
+    }
+
+
+def cached_summary(item, raw):
+    # Loading the row runs the engine's JSON deserializer once
+    item.item_metadata = show_metadata.json_loads(raw)
+    return {
+        'title': item.title,
+        'date': item.date,
+        'venue': item.venue,
+        'creator': item.creator,
+        'collection': item.collection,
+        'description': item.description,
+        'metadata': item.metadata_dict
+    }
+
+
+def run(summarize, items, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        # Every request works on newly loaded rows
+        for item, raw in items:
+            summarize(item, raw)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=20, help='Results per page')
+    parser.add_argument('--rounds', type=int, default=200, help='Pages serialized')
+    parser.add_argument('--description-size', type=int, default=20000, help='Characters of description per item')
+    parser.add_argument('--json-only', action='store_true', help='Parse with the json module even if orjson is installed')
+    args = parser.parse_args()
+
+    if args.json_only:
+        show_metadata.orjson = None
+
+    # (item, stored JSON text) pairs
+    items = [
+        (ArchiveItem(identifier=f'gd1977-05-{index:02d}.sbd.benchmark'),
+         json.dumps(make_metadata(index, args.description_size)))
+        for index in range(args.items)
+    ]
+
+    blob_size = sum(len(raw) for _, raw in items) // len(items)
+    backend = 'orjson' if show_metadata.orjson is not None else 'json'
+
+    uncached = run(uncached_summary, items, args.rounds)
+    cached = run(cached_summary, items, args.rounds)
+
+    pages = args.rounds
+    print(f"Items: {args.items} per page x {pages} pages, ~{blob_size // 1024} KB metadata each")
+    print(f"Parse on every accessor (json):   {uncached * 1000 / pages:.2f} ms/page")
+    print(f"Parsed once per row ({backend}):{' ' * (10 - len(backend))}{cached * 1000 / pages:.2f} ms/page")
+    print(f"Speedup: {uncached / cached:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,77 @@ class Config:
     ARCHIVE_BASE_URL = "https://archive.org/"
     REQUEST_TIMEOUT = 10000
     
+    # Shared Archive.org HTTP client (one pooled session per worker process)
+    ARCHIVE_CONNECT_TIMEOUT = int(os.environ.get('ARCHIVE_CONNECT_TIMEOUT', 5000))
+    ARCHIVE_POOL_CONNECTIONS = int(os.environ.get('ARCHIVE_POOL_CONNECTIONS', 4))  # Hosts kept in the pool
+    ARCHIVE_POOL_MAXSIZE = int(os.environ.get('ARCHIVE_POOL_MAXSIZE', 16))  # Keep-alive connections per host
+    ARCHIVE_MAX_RETRIES = int(os.environ.get('ARCHIVE_MAX_RETRIES', 2))
+    
+    # Archive.org response cache: 'memory' (per worker), 'sqlite' (shared by the
+    # workers on a host), 'redis' (shared by every host) or 'none'
+    ARCHIVE_CACHE_BACKEND = os.environ.get('ARCHIVE_CACHE_BACKEND', 'memory')
+    ARCHIVE_CACHE_MAX_ENTRIES = int(os.environ.get('ARCHIVE_CACHE_MAX_ENTRIES', 256))  # LRU bound (memory, sqlite)
+    ARCHIVE_CACHE_MAX_BYTES = int(os.environ.get('ARCHIVE_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # memory only
+    ARCHIVE_CACHE_PATH = os.environ.get('ARCHIVE_CACHE_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'storage', 'archive_cache.db')
+    ARCHIVE_CACHE_REDIS_URL = os.environ.get('ARCHIVE_CACHE_REDIS_URL') or os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    ARCHIVE_CACHE_TTL_METADATA = int(os.environ.get('ARCHIVE_CACHE_TTL_METADATA', 300))  # Seconds
+    ARCHIVE_CACHE_TTL_SEARCH = int(os.environ.get('ARCHIVE_CACHE_TTL_SEARCH', 600))
+    ARCHIVE_CACHE_TTL_TOTAL = int(os.environ.get('ARCHIVE_CACHE_TTL_TOTAL', 3600))
+    ARCHIVE_CACHE_TTL_NOT_FOUND = int(os.environ.get('ARCHIVE_CACHE_TTL_NOT_FOUND', 60))  # Cached 404s
+    
+    # Identical concurrent Archive.org calls share one request; with a sqlite or
+    # redis cache, SHARED extends this across workers
+    ARCHIVE_SINGLE_FLIGHT = os.environ.get('ARCHIVE_SINGLE_FLIGHT', 'true').lower() == 'true'
+    ARCHIVE_SINGLE_FLIGHT_SHARED = os.environ.get('ARCHIVE_SINGLE_FLIGHT_SHARED', 'false').lower() == 'true'
+    ARCHIVE_SINGLE_FLIGHT_WAIT = int(os.environ.get('ARCHIVE_SINGLE_FLIGHT_WAIT', 10))  # Seconds
+    
+    # Concurrent file downloads (per worker process)
+    DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 4))
+    # Open connections per data server (the item's 'server'). A segmented file holds one per
+    # segment and is cut into at most this many, so keep it <= ARCHIVE_POOL_MAXSIZE
+    DOWNLOAD_PER_HOST_LIMIT = int(os.environ.get('DOWNLOAD_PER_HOST_LIMIT', 4))
+    DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 3))  # Range resumes per file
+    DOWNLOAD_SEGMENTS = int(os.environ.get('DOWNLOAD_SEGMENTS', 4))  # Parallel ranges for large files
+    DOWNLOAD_SEGMENT_THRESHOLD = int(os.environ.get('DOWNLOAD_SEGMENT_THRESHOLD', 100 * 1024 * 1024))  # 0 disables
+    
+    # Shared download queue (backup_work_items) drained by every worker node
+    WORK_LEASE_SECONDS = int(os.environ.get('WORK_LEASE_SECONDS', 300))  # Claim expires without a heartbeat
+    WORK_CLAIM_BATCH = int(os.environ.get('WORK_CLAIM_BATCH', 8))  # Files claimed per round trip
+    
+    # /api/search/hybrid queries Archive.org on a thread pool while the local query runs
+    ARCHIVE_SEARCH_WORKERS = int(os.environ.get('ARCHIVE_SEARCH_WORKERS', 4))  # Threads per worker process
+    HYBRID_ARCHIVE_TIMEOUT = int(os.environ.get('HYBRID_ARCHIVE_TIMEOUT', 3000))  # ms before answering local-only
+    
+    # /play hands files to nginx via X-Accel-Redirect under this internal location ('' serves them from Flask)
+    PLAY_X_ACCEL_REDIRECT = os.environ.get('PLAY_X_ACCEL_REDIRECT', '')
+    
+    # /play keeps (identifier, file) -> disk path for hot tracks in each worker
+    PLAY_PATH_CACHE_SECONDS = int(os.environ.get('PLAY_PATH_CACHE_SECONDS', 300))  # 0 disables
+    PLAY_PATH_CACHE_SIZE = int(os.environ.get('PLAY_PATH_CACHE_SIZE', 1024))
+    
+    # Rows per page when following scrape API cursors (100-10000)
+    ARCHIVE_SCRAPE_PAGE_SIZE = int(os.environ.get('ARCHIVE_SCRAPE_PAGE_SIZE', 1000))
+    
+    # Library-wide ratings refresh (POST /api/update_ratings)
+    RATINGS_BATCH_SIZE = int(os.environ.get('RATINGS_BATCH_SIZE', 100))  # Identifiers per scrape query
+    
+    # Server-sent job progress (GET /api/backup/jobs/<id>/events)
+    JOB_EVENTS_INTERVAL = float(os.environ.get('JOB_EVENTS_INTERVAL', 1.0))  # Seconds between polls
+    JOB_EVENTS_MAX_SECONDS = int(os.environ.get('JOB_EVENTS_MAX_SECONDS', 30))  # Clients reconnect after this
+    
+    # Browse facet counts, cached per filter combination in each worker
+    FACET_CACHE_SECONDS = int(os.environ.get('FACET_CACHE_SECONDS', 60))  # 0 disables
+    FACET_CACHE_SIZE = int(os.environ.get('FACET_CACHE_SIZE', 256))  # Filter combinations kept
+    FACET_LIMIT = int(os.environ.get('FACET_LIMIT', 100))  # Creators/venues listed per facet
+    
+    # Per-request SQL instrumentation (Server-Timing header, [QueryStats] log lines)
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    QUERY_STATS_SERVER_TIMING = os.environ.get('QUERY_STATS_SERVER_TIMING', 'true').lower() == 'true'
+    QUERY_STATS_LOG_MS = int(os.environ.get('QUERY_STATS_LOG_MS', 100))  # Log requests with this much DB time; 0 logs all
+    QUERY_STATS_REPEAT_THRESHOLD = int(os.environ.get('QUERY_STATS_REPEAT_THRESHOLD', 10))  # Same statement more often: N+1 warning
+    QUERY_STATS_SLOWEST = int(os.environ.get('QUERY_STATS_SLOWEST', 3))  # Slowest statements kept per request
+    
     # Storage settings
     STORAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'storage')
     METADATA_STORAGE_PATH = os.path.join(STORAGE_PATH, 'metadata')
@@ -20,6 +91,7 @@ class Config:
     # Celery settings for background tasks
     CELERY_BROKER_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
     
     # Collections config
     DEFAULT_COLLECTION = "GratefulDead"
@@ -27,6 +99,17 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    
+    # Run backup jobs in-process unless a worker and Redis are available
+    CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'true').lower() == 'true'
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite://'
+    CELERY_TASK_ALWAYS_EAGER = True
+    
+    # Every call reaches the (stubbed) upstream unless a test opts in
+    ARCHIVE_CACHE_BACKEND = os.environ.get('ARCHIVE_CACHE_BACKEND', 'none')
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -44,6 +127,14 @@ class ProductionConfig(Config):
     METADATA_STORAGE_PATH = os.environ.get('METADATA_STORAGE_PATH') or '/var/lib/archive_backup/storage/metadata'
     FILES_STORAGE_PATH = os.environ.get('FILES_STORAGE_PATH') or '/var/lib/archive_backup/storage/files'
     
+    # Timings stay in the logs rather than in every response
+    QUERY_STATS_SERVER_TIMING = os.environ.get('QUERY_STATS_SERVER_TIMING', 'false').lower() == 'true'
+    
+    # One response cache for all gunicorn workers on the host
+    ARCHIVE_CACHE_BACKEND = os.environ.get('ARCHIVE_CACHE_BACKEND', 'sqlite')
+    ARCHIVE_CACHE_MAX_ENTRIES = int(os.environ.get('ARCHIVE_CACHE_MAX_ENTRIES', 10000))
+    ARCHIVE_CACHE_PATH = os.environ.get('ARCHIVE_CACHE_PATH') or '/var/lib/archive_backup/storage/archive_cache.db'
+    
     # Logging configuration
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
     
@@ -52,6 +143,7 @@ class ProductionConfig(Config):
 
 config = {
     'development': DevelopmentConfig,
+    'testing': TestingConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
 } 
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""Add progress tracking columns to backup_jobs
+
+Revision ID: 003_backup_job_progress
+Revises: 002_add_archive_item_stats
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003_backup_job_progress'
+down_revision = '002_add_archive_item_stats'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('backup_jobs') as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('current_step', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('progress', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('total_files', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('completed_files', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('failed_files', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('result_json', sa.Text(), nullable=True))
+    
+    # Job lists are ordered newest first
+    op.create_index('ix_backup_jobs_created_at', 'backup_jobs', ['created_at'])
+
+def downgrade():
+    op.drop_index('ix_backup_jobs_created_at', table_name='backup_jobs')
+    with op.batch_alter_table('backup_jobs') as batch_op:
+        batch_op.drop_column('result_json')
+        batch_op.drop_column('failed_files')
+        batch_op.drop_column('completed_files')
+        batch_op.drop_column('total_files')
+        batch_op.drop_column('progress')
+        batch_op.drop_column('current_step')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,41 @@
+"""Add backup_work_items claim queue
+
+Revision ID: 004_backup_work_items
+Revises: 003_backup_job_progress
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004_backup_work_items'
+down_revision = '003_backup_job_progress'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('backup_work_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('identifier', sa.String(length=255), nullable=False),
+        sa.Column('file_name', sa.String(length=500), nullable=False),
+        sa.Column('file_info_json', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('lease_owner', sa.String(length=255), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['backup_jobs.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('identifier', 'file_name', name='uq_backup_work_items_identifier_file')
+    )
+    op.create_index('ix_backup_work_items_claim', 'backup_work_items',
+                    ['identifier', 'status', 'lease_expires_at'])
+
+def downgrade():
+    op.drop_index('ix_backup_work_items_claim', table_name='backup_work_items')
+    op.drop_table('backup_work_items')
@@ -0,0 +1,39 @@
+"""Add indexed show columns extracted from archive_items.item_metadata
+
+Revision ID: 005_show_columns
+Revises: 004_backup_work_items
+Create Date: 2026-10-17 11:00:00.000000
+
+Existing rows are filled in by `flask backfill-show-columns`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005_show_columns'
+down_revision = '004_backup_work_items'
+branch_labels = None
+depends_on = None
+
+SHOW_COLUMNS = ('show_title', 'show_date', 'show_year', 'show_venue', 'show_creator', 'show_collection')
+
+def upgrade():
+    with op.batch_alter_table('archive_items') as batch_op:
+        batch_op.add_column(sa.Column('show_title', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('show_date', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('show_year', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('show_venue', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('show_creator', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('show_collection', sa.String(length=255), nullable=True))
+    
+    for column in SHOW_COLUMNS:
+        op.create_index(f'ix_archive_items_{column}', 'archive_items', [column])
+
+def downgrade():
+    for column in SHOW_COLUMNS:
+        op.drop_index(f'ix_archive_items_{column}', table_name='archive_items')
+    
+    with op.batch_alter_table('archive_items') as batch_op:
+        for column in reversed(SHOW_COLUMNS):
+            batch_op.drop_column(column)
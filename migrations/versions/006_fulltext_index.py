@@ -0,0 +1,38 @@
+"""Add full-text index over show metadata and reviews
+
+Revision ID: 006_fulltext_index
+Revises: 005_show_columns
+Create Date: 2026-10-17 12:00:00.000000
+
+SQLite gets an FTS5 virtual table, PostgreSQL a weighted tsvector table with a
+GIN index. Existing items are indexed by `flask rebuild-search-index`.
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '006_fulltext_index'
+down_revision = '005_show_columns'
+branch_labels = None
+depends_on = None
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS archive_item_fts USING fts5("
+    "title, venue, coverage, description, notes, reviews, tokenize='porter unicode61 remove_diacritics 2')"
+]
+POSTGRES_DDL = [
+    "CREATE TABLE IF NOT EXISTS archive_item_fts ("
+    "archive_item_id INTEGER PRIMARY KEY REFERENCES archive_items(id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_archive_item_fts_document ON archive_item_fts USING GIN (document)"
+]
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+
+def downgrade():
+    if op.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        op.execute("DROP TABLE IF EXISTS archive_item_fts")
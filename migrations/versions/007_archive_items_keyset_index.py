@@ -0,0 +1,20 @@
+"""Index archive_items on (created_at, id) for keyset pagination
+
+Revision ID: 007_archive_items_keyset_index
+Revises: 006_fulltext_index
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '007_archive_items_keyset_index'
+down_revision = '006_fulltext_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_archive_items_created_at_id', 'archive_items', ['created_at', 'id'])
+
+def downgrade():
+    op.drop_index('ix_archive_items_created_at_id', table_name='archive_items')
@@ -0,0 +1,20 @@
+"""Index archive_files on (archive_item_id, is_downloaded) for per-item file counts
+
+Revision ID: 008_archive_files_item_index
+Revises: 007_archive_items_keyset_index
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '008_archive_files_item_index'
+down_revision = '007_archive_items_keyset_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_archive_files_item_downloaded', 'archive_files', ['archive_item_id', 'is_downloaded'])
+
+def downgrade():
+    op.drop_index('ix_archive_files_item_downloaded', table_name='archive_files')
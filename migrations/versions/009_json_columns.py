@@ -0,0 +1,66 @@
+"""Store metadata, workable servers and star lists as JSON/JSONB with path indexes
+
+Revision ID: 009_json_columns
+Revises: 008_archive_files_item_index
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '009_json_columns'
+down_revision = '008_archive_files_item_index'
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = [
+    ('archive_items', 'item_metadata'),
+    ('archive_items', 'workable_servers'),
+    ('archive_item_stats', 'stars_json')
+]
+
+POSTGRES_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_gin ON archive_items USING GIN (item_metadata jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_date ON archive_items ((item_metadata ->> 'date'))"
+]
+SQLITE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_archive_items_metadata_date ON archive_items (json_extract(item_metadata, '$.date'))"
+]
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    
+    if dialect == 'postgresql':
+        # Text holding serialized JSON converts in place; empty strings become NULL
+        for table, column in JSON_COLUMNS:
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB "
+                       f"USING NULLIF({column}, '')::jsonb")
+        for statement in POSTGRES_INDEXES:
+            op.execute(statement)
+        return
+    
+    # SQLite keeps the serialized text; drop anything JSON1 cannot read, then retype
+    for table, column in JSON_COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = NULL "
+                   f"WHERE {column} IS NOT NULL AND ({column} = '' OR json_valid({column}) = 0)")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Text(), type_=sa.JSON())
+    
+    if dialect == 'sqlite':
+        for statement in SQLITE_INDEXES:
+            op.execute(statement)
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    op.execute("DROP INDEX IF EXISTS ix_archive_items_metadata_date")
+    
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_archive_items_metadata_gin")
+        for table, column in JSON_COLUMNS:
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE TEXT USING {column}::text")
+        return
+    
+    for table, column in JSON_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.JSON(), type_=sa.Text())
@@ -0,0 +1,41 @@
+"""Add the stats_rollup table of per-year, creator and collection totals
+
+Revision ID: 010_stats_rollup
+Revises: 009_json_columns
+Create Date: 2026-10-17 17:00:00.000000
+
+Existing items are counted by `flask rebuild-stats-rollup`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '010_stats_rollup'
+down_revision = '009_json_columns'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('stats_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('backed_up_count', sa.Integer(), nullable=False),
+        sa.Column('file_count', sa.Integer(), nullable=False),
+        sa.Column('downloaded_file_count', sa.Integer(), nullable=False),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('downloaded_bytes', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dimension', 'key', name='uq_stats_rollup_dimension_key')
+    )
+    op.create_index('ix_stats_rollup_dimension_items', 'stats_rollup', ['dimension', 'item_count'])
+    
+    # "Recent backups" on the stats page
+    op.create_index('ix_archive_items_backup_date', 'archive_items', ['backup_date'])
+
+def downgrade():
+    op.drop_index('ix_archive_items_backup_date', table_name='archive_items')
+    op.drop_index('ix_stats_rollup_dimension_items', table_name='stats_rollup')
+    op.drop_table('stats_rollup')
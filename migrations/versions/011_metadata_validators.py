@@ -0,0 +1,25 @@
+"""Store the ETag and Last-Modified of each item's last metadata response
+
+Revision ID: 011_metadata_validators
+Revises: 010_stats_rollup
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '011_metadata_validators'
+down_revision = '010_stats_rollup'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('archive_items') as batch_op:
+        batch_op.add_column(sa.Column('metadata_etag', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('metadata_last_modified', sa.String(length=64), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('archive_items') as batch_op:
+        batch_op.drop_column('metadata_last_modified')
+        batch_op.drop_column('metadata_etag')
@@ -0,0 +1,50 @@
+"""Unique index on archive_files (archive_item_id, name) for lookups by file name
+
+Revision ID: 012_archive_files_item_name
+Revises: 011_metadata_validators
+Create Date: 2026-10-17 19:00:00.000000
+
+Duplicate rows for the same file are removed first, keeping the downloaded
+row (or else the oldest). Run `flask rebuild-stats-rollup` afterwards if any
+were removed, so the file totals stop counting them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '012_archive_files_item_name'
+down_revision = '011_metadata_validators'
+branch_labels = None
+depends_on = None
+
+# Ids per DELETE statement
+DELETE_BATCH = 500
+
+def upgrade():
+    connection = op.get_bind()
+    # CASE rather than is_downloaded DESC: PostgreSQL sorts NULLs first in a DESC order
+    rows = connection.execute(sa.text(
+        "SELECT id, archive_item_id, name FROM archive_files WHERE name IS NOT NULL "
+        "AND (archive_item_id, name) IN (SELECT archive_item_id, name FROM archive_files "
+        "WHERE name IS NOT NULL GROUP BY archive_item_id, name HAVING COUNT(*) > 1) "
+        "ORDER BY archive_item_id, name, CASE WHEN is_downloaded THEN 1 ELSE 0 END DESC, id"
+    )).fetchall()
+    
+    kept = set()
+    duplicate_ids = []
+    for file_id, archive_item_id, name in rows:
+        if (archive_item_id, name) in kept:
+            duplicate_ids.append(file_id)
+        else:
+            kept.add((archive_item_id, name))
+    
+    for start in range(0, len(duplicate_ids), DELETE_BATCH):
+        connection.execute(sa.text("DELETE FROM archive_files WHERE id IN :ids").bindparams(
+            sa.bindparam('ids', expanding=True)), {'ids': duplicate_ids[start:start + DELETE_BATCH]})
+    if duplicate_ids:
+        print(f"Removed {len(duplicate_ids)} duplicate archive_files rows; run flask rebuild-stats-rollup")
+    
+    op.create_index('uq_archive_files_item_name', 'archive_files', ['archive_item_id', 'name'], unique=True)
+
+def downgrade():
+    op.drop_index('uq_archive_files_item_name', table_name='archive_files')